@@ -0,0 +1,189 @@
+import json
+from flask import Blueprint, Response, abort, current_app, request, stream_with_context
+from models import db, Venue, Artist, Show
+from facets import apply_filters, parse_filters
+from genres import with_genre_names
+from loaders import SHOW_LISTING_COLUMNS, load_venue, load_artist, shows_listing, encode_cursor, decode_cursor
+from conditional import conditional, venue_version, artist_version, venues_version, artists_version, shows_version
+from serializers import dumps, dumps_text
+
+#----------------------------------------------------------------------------#
+# Read-only JSON API, version 1.
+#----------------------------------------------------------------------------#
+
+api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+# public field -> column; genres are not a column and are read from the link tables
+VENUE_FIELDS = {
+    'id': Venue.id,
+    'name': Venue.name,
+    'city': Venue.city,
+    'state': Venue.state,
+    'address': Venue.address,
+    'phone': Venue.phone,
+    'image_link': Venue.image_link,
+    'facebook_link': Venue.facebook_link,
+    'genres': None,
+    'website': Venue.website,
+    'seeking_talent': Venue.seeking_talent,
+    'seeking_description': Venue.seeking_discription,
+    'updated_at': Venue.updated_at,
+    'upcoming_shows_count': Venue.upcoming_shows_count,
+    'past_shows_count': Venue.past_shows_count,
+    'next_show_at': Venue.next_show_at,
+}
+
+ARTIST_FIELDS = {
+    'id': Artist.id,
+    'name': Artist.name,
+    'city': Artist.city,
+    'state': Artist.state,
+    'phone': Artist.phone,
+    'image_link': Artist.image_link,
+    'facebook_link': Artist.facebook_link,
+    'genres': None,
+    'website': Artist.website,
+    'seeking_venue': Artist.seeking_venue,
+    'seeking_description': Artist.seeking_discription,
+    'updated_at': Artist.updated_at,
+    'upcoming_shows_count': Artist.upcoming_shows_count,
+    'past_shows_count': Artist.past_shows_count,
+    'next_show_at': Artist.next_show_at,
+}
+
+DEFAULT_FIELDS = ['id', 'name']
+
+
+#  Responses
+#  ----------------------------------------------------------------
+
+def json_response(value):
+    return Response(dumps(value), mimetype='application/json')
+
+
+def stream_collection(fields, rows, limit, cursor_for):
+    # writes {"data": [...], "next": ...} row by row, so a page is never held
+    # in memory as one list or one string
+    def generate():
+        yield '{"data":['
+        last = None
+        for count, row in enumerate(rows):
+            if count == limit:
+                # the extra row only tells us there is a next page
+                yield f'],"next":{json.dumps(cursor_for(last))}}}'
+                return
+            if count:
+                yield ','
+            yield dumps_text(dict(zip(fields, row)))
+            last = row
+        yield '],"next":null}'
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+#  Request arguments
+#  ----------------------------------------------------------------
+
+def requested_fields(available, default):
+    # ?fields=id,name,city selects only those columns
+    fields = request.args.get('fields')
+    fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else list(default)
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        abort(400, description=f'Unknown fields: {", ".join(unknown)}')
+    return fields
+
+
+def page_limit():
+    limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int)
+    return max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
+
+def id_cursor():
+    after = request.args.get('after')
+    if after is None:
+        return None
+    if not after.isdigit():
+        abort(400, description='Invalid cursor')
+    return int(after)
+
+
+#  Venues and artists
+#  ----------------------------------------------------------------
+
+def entity_collection(kind, model, available):
+    fields = requested_fields(available, DEFAULT_FIELDS)
+    limit = page_limit()
+    after = id_cursor()
+
+    # the id is always selected last so the cursor can be built from any projection
+    columns = [available[field] for field in fields if available[field] is not None]
+    query = db.session.query(*columns, model.id.label('cursor_id'))
+    query = apply_filters(query, kind, parse_filters(kind, request.args))
+    if after is not None:
+        query = query.filter(model.id > after)
+    rows = query.order_by(model.id).limit(limit + 1).yield_per(500)
+
+    if 'genres' in fields:
+        position = fields.index('genres')
+        rows = (tuple(row[:position]) + (genres,) + tuple(row[position:])
+                for row, genres in with_genre_names(kind, rows, id_index=-1))
+
+    return stream_collection(fields, rows, limit, cursor_for=lambda row: str(row[-1]))
+
+
+@api_v1.route('/venues')
+@conditional(venues_version)
+def venues():
+    return entity_collection('venue', Venue, VENUE_FIELDS)
+
+
+@api_v1.route('/venues/<int:venue_id>')
+@conditional(venue_version)
+def venue(venue_id):
+    venue = load_venue(venue_id)
+    if venue is None:
+        abort(404)
+    return json_response(venue)
+
+
+@api_v1.route('/artists')
+@conditional(artists_version)
+def artists():
+    return entity_collection('artist', Artist, ARTIST_FIELDS)
+
+
+@api_v1.route('/artists/<int:artist_id>')
+@conditional(artist_version)
+def artist(artist_id):
+    artist = load_artist(artist_id)
+    if artist is None:
+        abort(404)
+    return json_response(artist)
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@api_v1.route('/shows')
+@conditional(shows_version)
+def shows():
+    fields = requested_fields(SHOW_LISTING_COLUMNS, SHOW_LISTING_COLUMNS)
+    limit = page_limit()
+    after = None
+    if request.args.get('after'):
+        after = decode_cursor(request.args['after'])
+        if after is None:
+            abort(400, description='Invalid cursor')
+
+    # start_time and id are always selected last so the cursor can be built from any projection
+    columns = [SHOW_LISTING_COLUMNS[field] for field in fields] + [
+        Show.start_time.label('cursor_start_time'), Show.id.label('cursor_id')]
+    rows = shows_listing(after, columns).limit(limit + 1).yield_per(500)
+
+    return stream_collection(fields, rows, limit, cursor_for=lambda row: encode_cursor(row[-2], row[-1]))
+
+
+@api_v1.errorhandler(400)
+@api_v1.errorhandler(404)
+def api_error(error):
+    return json_response({'error': error.description}), error.code
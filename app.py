@@ -1,100 +1,160 @@
 #----------------------------------------------------------------------------#
 # Imports
 #----------------------------------------------------------------------------#
+import os
 import sys
-from urllib import response
-import dateutil.parser
-import babel
+import logging
+from logging import Formatter, FileHandler
+from urllib.parse import urlencode
 from flask import (
+    Blueprint,
     Flask,
+    Response,
+    abort,
+    current_app,
+    jsonify,
+    stream_with_context,
     render_template, 
     request,
     flash, 
     redirect, 
     url_for
 )
-from flask_moment import Moment
-import logging
-from logging import Formatter, FileHandler
-from flask_wtf import FlaskForm as Form
-from forms import *
-from flask_migrate import Migrate
-from models import *
-from flask_wtf.csrf import CsrfProtect
+from flask_wtf.csrf import CSRFProtect
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist
+from loaders import (iter_areas, artist_listing, shows_page, decode_cursor, search,
+  venue_listing_tags, artist_listing_tags, detail_tags, next_show_start, shows_page_tags)
+from cache import Cache
+from autocomplete import Autocomplete
+from facets import adjust_facets, entity_facets, facet_sidebar, parse_filters
+from genres import set_genres
+from deletion import delete_entities
+from scheduling import ScheduleError, InvalidEntries, UnknownReferences, parse_entries, schedule_shows
+from show_calendar import ShowCalendar, adjacent_windows, parse_window, parse_calendar_filters
+from commands import fyyur_cli
+from api import api_v1
+from exporter import EXPORTS, FORMATS as EXPORT_FORMATS, generate_export, parse_filters as parse_export_filters
+from rendering import init_bytecode_cache, stream_page
+from formatting import display_settings, init_formatting
+from conditional import conditional, venue_version, artist_version, venues_version, artists_version, shows_version
+from instrumentation import Instrumentation
+from replicas import Replicas
+from async_details import AsyncDetails
+from serializers import dumps
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-CsrfProtect(app)
-db.init_app(app)
-migrate = Migrate(app, db)
-
-#----------------------------------------------------------------------------#
-# Filters.
-#----------------------------------------------------------------------------#
-
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
-
-app.jinja_env.filters['datetime'] = format_datetime
+csrf = CSRFProtect()
+instrumentation = Instrumentation()
+cache = Cache()
+autocomplete = Autocomplete()
+show_calendar = ShowCalendar()
+replicas = Replicas()
+async_details = AsyncDetails()
+main = Blueprint('main', __name__)
+
+
+def create_app(config=None):
+  # config.py, then FYYUR_* environment variables (FYYUR_SECRET_KEY,
+  # FYYUR_SQLALCHEMY_DATABASE_URI, ...), then `config`: a dict or an object path
+  app = Flask(__name__)
+  app.config.from_object('config')
+  app.config.from_prefixed_env('FYYUR')
+  if isinstance(config, dict):
+    app.config.update(config)
+  elif config is not None:
+    app.config.from_object(config)
+
+  if not app.config.get('SECRET_KEY'):
+    if not (app.debug or app.testing):
+      # every worker has to sign CSRF tokens and sessions with the same key
+      raise RuntimeError('Set SECRET_KEY (or FYYUR_SECRET_KEY) to a stable secret')
+    app.config['SECRET_KEY'] = 'dev'
+
+  init_bytecode_cache(app)
+  csrf.init_app(app)
+  db.init_app(app)
+  if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+    # only the `flask db` commands need Flask-Migrate, and importing alembic
+    # is the largest part of startup, so web workers skip it
+    from flask_migrate import Migrate
+    Migrate(app, db)
+  instrumentation.init_app(app, db)
+  replicas.init_app(app)
+  for engine in replicas.engines(app):
+    instrumentation.watch_pool(app, engine)
+  async_details.init_app(app)
+  for engine in async_details.engines(app):
+    instrumentation.watch_pool(app, engine.sync_engine)
+  cache.init_app(app, db)
+  autocomplete.init_app(app)
+  show_calendar.init_app(app, cache)
+  # |datetime and |datetimes, in the request's locale and timezone
+  init_formatting(app)
+  app.cli.add_command(fyyur_cli)
+  app.register_blueprint(main)
+  app.register_blueprint(api_v1)
+
+  if not app.debug and not app.testing:
+    file_handler = FileHandler('error.log')
+    file_handler.setFormatter(
+        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+    )
+    app.logger.setLevel(logging.INFO)
+    file_handler.setLevel(logging.INFO)
+    app.logger.addHandler(file_handler)
+    app.logger.info('errors')
+  return app
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+@main.route('/')
 def index():
   return render_template('pages/home.html')
 
 
+#  Autocomplete
+#  ----------------------------------------------------------------
+
+@main.route('/api/autocomplete')
+def autocomplete_names():
+  # typeahead suggestions served from the in-process prefix index
+  kind = request.args.get('kind', 'venue')
+  if kind not in Autocomplete.models:
+    abort(400)
+
+  results = autocomplete.lookup(kind, request.args.get('q', ''))
+  return jsonify({'kind': kind, 'results': results})
+
+
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@main.route('/venues')
+@replicas.reads
+@conditional(venues_version)
 def venues():
-  response_data = []
-
-  # Getting the unique cities and state for all venues
-  states_cities = db.session.query(Venue.state, Venue.city)
-  
-  # filtering the venues base on city and state
-  for data in states_cities:
-    show_result = Venue.query.filter(Venue.state == data.state).filter(Venue.city==data.city).all()
-    
-    # Querying for upcoming shows by filtering with time greater than current time
-    upcoming_shows = len(db.session.query(Show).filter(Show.start_time > datetime.now()).all())
-    # creating response data for venues
-    show_venue_data = [{
-        'id': venue.id,
-        'name': venue.name,
-        'num_upcoming_shows': upcoming_shows
-      } for venue in show_result]
-
-    response_data.append({
-        'city': data.city,
-        'state': data.state,
-        'venues': show_venue_data
-      })
-
-
-  return render_template('pages/venues.html', areas=response_data);
-
-@app.route('/venues/search', methods=['POST'])
+  # venues grouped by area, each with its own number of upcoming shows,
+  # optionally narrowed down by genre, state and seeking_talent
+  filters = parse_filters('venue', request.args)
+  # on a miss the areas stream out as they are read, and are cached at the end
+  areas = cache.cached_items(f'venues?{urlencode(sorted(filters.items()))}', lambda: iter_areas(filters=filters),
+    tags=venue_listing_tags)
+  return stream_page('pages/venues.html', areas=areas,
+    facets=facet_sidebar('venue', request.args));
+
+@main.route('/venues/search', methods=['POST'])
+@replicas.reads
 def search_venues():
   
   search_term = request.form.get('search_term', '')
 
-  # performing a case insensitive maching on venue names
-  data = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).order_by('name').all()
+  # ranked, case-insensitive matching on venue names or "city, state"
+  data = search(Venue, search_term, limit=current_app.config['SEARCH_RESULTS_LIMIT'])
  
   response={
     "count": len(data),
@@ -102,90 +162,39 @@ def search_venues():
   }
   return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
-@app.route('/venues/<int:venue_id>')
+@main.route('/venues/<int:venue_id>')
+@replicas.reads
+@conditional(venue_version)
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  venue_data = db.session.query(Venue).get(venue_id)
-
-  # genres = []
-  # for item in venue_data.genres:
-  #   genres.append(item)
-
-  past_show_data = db.session.query(Show, Artist).join(Artist, Artist.id==Show.artist_id).filter(Show.venue_id==venue_id).filter(Show.start_time < datetime.now())
-  upcoming_show_data =  db.session.query(Show, Artist).join(Artist, Artist.id==Show.artist_id).filter(Show.venue_id==venue_id).filter(Show.start_time > datetime.now())
-  
-  upcoming_shows = []
-  for show, artist in upcoming_show_data.all():
-      upcoming_shows.append({
-        'artist_id': artist.id,
-        'artist_name': artist.name,
-        'artist_image_link': artist.image_link,
-        'start_time': show.start_time
-      })
-  
-  past_shows = []
-  for show, artist in past_show_data.all():
-      past_shows.append({
-        'artist_id': artist.id,
-        'artist_name': artist.name,
-        'artist_image_link': artist.image_link,
-        'start_time': show.start_time
-      })
-  
-  venue = {
-    
-    "id": venue_data.id,
-    "name": venue_data.name,
-    "genres": venue_data.genres,
-    "address": venue_data.address,
-    "city": venue_data.city,
-    "state": venue_data.state,
-    "phone": venue_data.phone,
-    "website": venue_data.website,
-    "facebook_link": venue_data.facebook_link,
-    "seeking_talent": venue_data.seeking_talent,
-    "seeking_description": venue_data.seeking_discription,
-    "image_link": venue_data.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_show_data.all()),
-    "upcoming_shows_count": len(upcoming_show_data.all()),
-  }
+  venue = cache.cached(f'venue:{venue_id}', lambda: async_details.load('venue', venue_id),
+    tags=lambda venue: detail_tags('venue', venue_id, venue), expires_at=next_show_start)
+  if venue is None:
+    abort(404)
 
-  return render_template('pages/show_venue.html', venue=venue)
+  return stream_page('pages/show_venue.html', venue=venue)
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@main.route('/venues/create', methods=['GET'])
 def create_venue_form():
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
 
-@app.route('/venues/create', methods=['POST'])
+@main.route('/venues/create', methods=['POST'])
 def create_venue_submission():
   form = VenueForm(request.form)
   if form.validate():
   # insert form data as a new Venue record in the db, instead
     try: 
         
-          new_venue = Venue(
-          name=form.name.data,
-          city=form.city.data,
-          state=form.state.data,
-          address=form.address.data,
-          phone=form.phone.data,
-          genres=form.genres.data,
-          facebook_link=form.facebook_link.data,
-          image_link=form.image_link.data,
-          website=form.website_link.data,
-          seeking_talent= True if form.seeking_talent.data else False,
-          seeking_discription=form.seeking_description.data,
-          )
-          
+          new_venue = Venue(**form.column_values())
+          set_genres(new_venue, form.genres.data)
           db.session.add(new_venue)
+          adjust_facets('venue', added=entity_facets('venue', new_venue))
           db.session.commit()
+          autocomplete.add('venue', new_venue.id, new_venue.name)
           flash(f"Venue {request.form['name']} was successfully listed!")
     except:
           db.session.rollback()
@@ -198,37 +207,40 @@ def create_venue_submission():
         flash(f"An error occurred {form.errors} Venue {request.form.get('name')}  could not be listed.")
   return render_template('pages/home.html')
 
-@app.route('/venues/<venue_id>/delete', methods=['DELETE'])
+@main.route('/venues/<int:venue_id>/delete', methods=['DELETE'])
 def delete_venue(venue_id):
-    # taking a venue_id, and using SQLAlchemy ORM to delete a record.
-    #  Handle cases where the session commit could fail.
-    try:
-          venue = Venue.query.get(venue_id)
-          db.session.delete(venue)
-          db.session.commit()
-    except:
-          print(sys.exc_info())
-          db.session.rollback()
+  # deletes the venue with its shows; see delete_entities
+  result = remove_entities('venue', [venue_id])
+  if not result['deleted']:
+    abort(404)
+  return jsonify(result)
 
-    finally:
-          db.session.close()
-    return render_template('pages/home.html')
+@main.route('/venues/delete', methods=['POST'])
+def delete_venues():
+  # {"ids": [1, 2, ...]}; ids that do not exist are left out of "deleted"
+  return bulk_delete('venue')
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@main.route('/artists')
+@replicas.reads
+@conditional(artists_version)
 def artists():
-  # replace with real data returned from querying the database
-  data = db.session.query(Artist.id, Artist.name).all()
-  return render_template('pages/artists.html', artists=data)
-
-@app.route('/artists/search', methods=['POST'])
+  # artists, optionally narrowed down by genre, state and seeking_venue
+  filters = parse_filters('artist', request.args)
+  data = cache.cached_items(f'artists?{urlencode(sorted(filters.items()))}',
+    lambda: (row._asdict() for row in artist_listing(filters).yield_per(500)), tags=artist_listing_tags)
+  return stream_page('pages/artists.html', artists=data,
+    facets=facet_sidebar('artist', request.args))
+
+@main.route('/artists/search', methods=['POST'])
+@replicas.reads
 def search_artists():
   # implement search on artists with partial string search. Ensure it is case-insensitive.
   search_term = request.form.get('search_term', '')
 
-  # performing a case insensitive maching on artist names
-  data = Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).order_by('name').all()
+  # ranked, case-insensitive matching on artist names or "city, state"
+  data = search(Artist, search_term, limit=current_app.config['SEARCH_RESULTS_LIMIT'])
  
   response={
     "count": len(data),
@@ -236,55 +248,21 @@ def search_artists():
   }
   return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
-@app.route('/artists/<int:artist_id>')
+@main.route('/artists/<int:artist_id>')
+@replicas.reads
+@conditional(artist_version)
 def show_artist(artist_id):
   # shows the artist page with the given artist_id
-  # replace with real artist data from the artist table, using artist_id
-  artist_data = db.session.query(Artist).get(artist_id)
-  past_show_data = db.session.query(Show, Artist).join(Artist, Artist.id==Show.artist_id).filter(Show.artist_id==artist_id).filter(Show.start_time < datetime.now())
-  upcoming_show_data =  db.session.query(Show, Artist).join(Artist, Artist.id==Show.artist_id).filter(Show.artist_id==artist_id).filter(Show.start_time > datetime.now())
-  upcoming_shows = []
-  for show, artist in upcoming_show_data.all():
-      upcoming_shows.append({
-        'artist_id': artist.id,
-        'artist_name': artist.name,
-        'artist_image_link': artist.image_link,
-        'start_time': show.start_time
-      })
-  
-  past_shows = []
-  for show, artist in past_show_data.all():
-      past_shows.append({
-        'artist_id': artist.id,
-        'artist_name': artist.name,
-        'artist_image_link': artist.image_link,
-        'start_time': show.start_time
-      })
-  
-  data = {
-    
-    "id": artist_data.id,
-    "name": artist_data.name,
-    "genres": artist_data.genres,
-    "city": artist_data.city,
-    "state": artist_data.state,
-    "phone": artist_data.phone,
-    "website": artist_data.website,
-    "facebook_link": artist_data.facebook_link,
-    "seeking_venue": artist_data.seeking_venue,
-    "seeking_description": artist_data.seeking_discription,
-    "image_link": artist_data.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_show_data.all()),
-    "upcoming_shows_count": len(upcoming_show_data.all()),
-  }
+  artist = cache.cached(f'artist:{artist_id}', lambda: async_details.load('artist', artist_id),
+    tags=lambda artist: detail_tags('artist', artist_id, artist), expires_at=next_show_start)
+  if artist is None:
+    abort(404)
 
-  return render_template('pages/show_artist.html', artist=data)
+  return stream_page('pages/show_artist.html', artist=artist)
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
   form = ArtistForm()
   artist = Artist.query.filter(Artist.id==artist_id).first()
@@ -292,7 +270,7 @@ def edit_artist(artist_id):
     form.name.data = artist.name
     form.city.data = artist.city
     form.state.data = artist.state
-    form.genres.data = artist.genres
+    form.genres.data = [genre.name for genre in artist.genres]
     form.phone.data = artist.phone
     form.website_link.data = artist.website
     form.facebook_link.data = artist.facebook_link
@@ -303,27 +281,22 @@ def edit_artist(artist_id):
   # populate form with fields from artist with ID <artist_id>
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
   # take values from the form submitted, and update existing
   # artist record with ID <artist_id> using the new attributes
   form = ArtistForm(request.form)
   if form.validate():
-    artist_updated_data = {
-        "name": form.name.data,
-        "city": form.city.data,
-        "state": form.state.data,
-        "phone": form.phone.data,
-        "genres": form.genres.data,
-        "facebook_link": form.facebook_link.data,
-        "image_link": form.image_link.data,
-        "website": form.website_link.data,
-        "seeking_venue":  True if form.seeking_venue.data else False,
-        "seeking_discription": form.seeking_description.data,
-    }
+    artist_updated_data = form.column_values()
     try:
-        db.session.query(Artist).filter(Artist.id==artist_id).update(artist_updated_data)  
+        artist = Artist.query.get(artist_id)
+        old_facets = entity_facets('artist', artist)
+        for column, value in artist_updated_data.items():
+          setattr(artist, column, value)
+        set_genres(artist, form.genres.data)
+        adjust_facets('artist', removed=old_facets, added=entity_facets('artist', artist))
         db.session.commit()
+        autocomplete.add('artist', artist_id, form.name.data)
         flash(f"Artist {request.form.get('name')} was updated successfully!")
     except:
         flash(f"An error occurred Artist{request.form.get('name')} could not be updated")
@@ -334,9 +307,9 @@ def edit_artist_submission(artist_id):
   else:
         print("\n\n", form.errors)
         flash(f"An error occurred Artist {request.form.get('name')}  could not be listed.")
-  return redirect(url_for('show_artist', artist_id=artist_id))
+  return redirect(url_for('.show_artist', artist_id=artist_id))
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
   form = VenueForm()
   venue = Venue.query.filter(Venue.id==venue_id).first()
@@ -346,7 +319,7 @@ def edit_venue(venue_id):
     form.city.data = venue.city
     form.state.data = venue.state
     form.address.data = venue.address
-    form.genres.data = venue.genres
+    form.genres.data = [genre.name for genre in venue.genres]
     form.phone.data = venue.phone
     form.website_link.data = venue.website
     form.facebook_link.data = venue.facebook_link
@@ -357,26 +330,20 @@ def edit_venue(venue_id):
   # populate form with values from venue with ID <venue_id>
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
   form = VenueForm(request.form)
   if form.validate():
-    venue_updated_data = {
-        "name": form.name.data,
-        "city": form.city.data,
-        "state": form.state.data,
-        "address": form.address.data,
-        "phone": form.phone.data,
-        "genres": form.genres.data,
-        "facebook_link": form.facebook_link.data,
-        "image_link": form.image_link.data,
-        "website": form.website_link.data,
-        "seeking_talent":  True if form.seeking_talent.data else False,
-        "seeking_discription": form.seeking_description.data,
-    }
+    venue_updated_data = form.column_values()
     try:
-        db.session.query(Venue).filter(Venue.id==venue_id).update(venue_updated_data)
+        venue = Venue.query.get(venue_id)
+        old_facets = entity_facets('venue', venue)
+        for column, value in venue_updated_data.items():
+          setattr(venue, column, value)
+        set_genres(venue, form.genres.data)
+        adjust_facets('venue', removed=old_facets, added=entity_facets('venue', venue))
         db.session.commit()
+        autocomplete.add('venue', venue_id, form.name.data)
         flash(f"Venue {request.form.get('name')} was updated updated successfully!")
     except:
         sys.exc_info()
@@ -388,36 +355,65 @@ def edit_venue_submission(venue_id):
         print("\n\n", form.errors)
         flash(f"An error occurred Venue. {request.form.get('name')}  could not be listed.")
 
-  return redirect(url_for('show_venue', venue_id=venue_id))
+  return redirect(url_for('.show_venue', venue_id=venue_id))
+
+#  Delete Artist
+#  ----------------------------------------------------------------
+
+@main.route('/artists/<int:artist_id>/delete', methods=['DELETE'])
+def delete_artist(artist_id):
+  result = remove_entities('artist', [artist_id])
+  if not result['deleted']:
+    abort(404)
+  return jsonify(result)
+
+@main.route('/artists/delete', methods=['POST'])
+def delete_artists():
+  return bulk_delete('artist')
+
+def bulk_delete(kind):
+  payload = request.get_json(silent=True)
+  ids = payload.get('ids') if isinstance(payload, dict) else None
+  if not isinstance(ids, list) or not ids or not all(type(entity_id) is int for entity_id in ids):
+    return jsonify(error='expected {"ids": [integer, ...]}'), 400
+  if len(ids) > current_app.config['DELETE_BATCH_MAX']:
+    return jsonify(error=f"at most {current_app.config['DELETE_BATCH_MAX']} ids per request"), 400
+  return jsonify(remove_entities(kind, ids))
+
+def remove_entities(kind, ids):
+  try:
+    result = delete_entities(kind, ids, chunk_size=current_app.config['DELETE_CHUNK_SIZE'])
+  except:
+    db.session.rollback()
+    raise
+  finally:
+    db.session.close()
+
+  # the database side (counters, facets, page cache) went with the commits
+  for entity_id in result['deleted']:
+    autocomplete.remove(kind, entity_id)
+  return result
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@main.route('/artists/create', methods=['GET'])
 def create_artist_form():
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/create', methods=['POST'])
+@main.route('/artists/create', methods=['POST'])
 def create_artist_submission():
   form = ArtistForm(request.form)
   if form.validate():
     try:
         
-          new_artist = Artist(
-          name=form.name.data,
-          city=form.city.data,
-          state=form.state.data,
-          phone=form.phone.data,
-          genres=form.genres.data,
-          facebook_link=form.facebook_link.data,
-          image_link=form.image_link.data,
-          website=form.website_link.data,
-          seeking_venue= True if form.seeking_venue.data else False,
-          seeking_discription=form.seeking_description.data,
-          )
+          new_artist = Artist(**form.column_values())
+          set_genres(new_artist, form.genres.data)
           db.session.add(new_artist)
+          adjust_facets('artist', added=entity_facets('artist', new_artist))
           db.session.commit()
+          autocomplete.add('artist', new_artist.id, new_artist.name)
           flash(f"Artist {request.form['name']} was successfully listed!")
     except:
           flash(f"An error occurred  Artist {request.form.get('name')}  could not be listed.")
@@ -434,44 +430,64 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@main.route('/shows')
+@replicas.reads
+@conditional(shows_version)
 def shows():
-  # displays list of shows at /shows
-  # replace with real venues data.
-  shows_data = db.session.query(Show).join(Venue, Venue.id==Show.venue_id).join(Artist, Artist.id==Show.artist_id).all()
-
-  data = []
-  for show in shows_data:
-    data.append({
-    'venue_id': show.venue_id,
-    'venue_name': show.venue.name,
-    'artist_id': show.artist_id,
-    'artist_name': show.artist.name,
-    'artist_image_link': show.artist.image_link,
-    'start_time': str(show.start_time)
-  })
-  return render_template('pages/shows.html', shows=data)
-
-@app.route('/shows/create')
+  # displays one page of shows at /shows, ordered by start time
+  after = None
+  cursor = request.args.get('after')
+  if cursor:
+    after = decode_cursor(cursor)
+    if after is None:
+      abort(400)
+
+  data, next_cursor = cache.cached(f'shows?after={cursor or ""}',
+    lambda: shows_page(after=after, per_page=current_app.config['SHOWS_PER_PAGE']), tags=shows_page_tags)
+  return stream_page('pages/shows.html', shows=data, next_cursor=next_cursor, is_first_page=after is None)
+
+def calendar_window():
+  # the requested window and filters, answering 400 for unreadable dates
+  try:
+    first_day, last_day = parse_window(request.args, current_app.config['CALENDAR_MAX_DAYS'])
+  except ValueError:
+    abort(400)
+  return first_day, last_day, parse_calendar_filters(request.args)
+
+@main.route('/shows/calendar')
+def shows_calendar():
+  # shows grouped by day, e.g. /shows/calendar?from=2022-08-01&to=2022-08-07&state=CA
+  first_day, last_day, filters = calendar_window()
+  days = show_calendar.days(first_day, last_day, filters, display_settings()[1])
+  earlier, later = adjacent_windows(first_day, last_day)
+  return stream_page('pages/calendar.html', days=days, first_day=first_day, last_day=last_day,
+    filters=filters, earlier=earlier, later=later)
+
+@main.route('/shows/calendar.json')
+def shows_calendar_json():
+  first_day, last_day, filters = calendar_window()
+  days = show_calendar.days(first_day, last_day, filters, display_settings()[1])
+  return Response(dumps({'from': first_day, 'to': last_day, 'filters': filters, 'days': days}), mimetype='application/json')
+
+@main.route('/shows/create')
 def create_shows():
   # renders form. do not touch.
   form = ShowForm()
   return render_template('forms/new_show.html', form=form)
 
-@app.route('/shows/create', methods=['POST'])
+@main.route('/shows/create', methods=['POST'])
 def create_show_submission():
   # called to create new shows in the db, upon submitting new show listing form
   form = ShowForm(request.form)
   if form.validate():
     try:
-          new_show = Show(
-          artist_id=form.artist_id.data,
-          venue_id=form.venue_id.data,
-          start_time=form.start_time.data
-          )
-          db.session.add(new_show)
+          entry = form.schedule_entry()
+          schedule_shows([entry])
           db.session.commit()
           flash(f"Show was successfully listed!")
+    except ScheduleError as error:
+          db.session.rollback()
+          flash(f"Show could not be listed: {error.problems[0]['error']}.")
     except:
           flash(f"An error occurred Show could not be listed.")
           db.session.rollback()
@@ -483,36 +499,54 @@ def create_show_submission():
         flash(f"An error occurred Show could not be listed.")
   return render_template('pages/home.html')
 
-@app.errorhandler(404)
+@main.route('/shows/batch', methods=['POST'])
+def schedule_shows_batch():
+  # schedules a tour in one transaction: {"shows": [{"artist_id": 1, "venue_id": 2,
+  # "start_time": "2022-09-01T20:00", "duration_minutes": 90}, ...]}. Nothing is
+  # listed unless every entry is valid and free of double bookings.
+  payload = request.get_json(silent=True)
+  records = payload.get('shows') if isinstance(payload, dict) else None
+  if not isinstance(records, list) or not records:
+    return jsonify(errors=[{'index': None, 'error': 'expected {"shows": [...]}'}]), 400
+  if len(records) > current_app.config['SCHEDULE_BATCH_MAX']:
+    return jsonify(errors=[{'index': None, 'error': f"at most {current_app.config['SCHEDULE_BATCH_MAX']} shows per batch"}]), 400
+
+  try:
+    entries = parse_entries(records)
+    show_ids = schedule_shows(entries)
+    db.session.commit()
+  except ScheduleError as error:
+    db.session.rollback()
+    status = 400 if isinstance(error, InvalidEntries) else 422 if isinstance(error, UnknownReferences) else 409
+    return jsonify(errors=error.problems), status
+  finally:
+    db.session.close()
+
+  return jsonify(created=show_ids), 201
+
+#  Export
+#  ----------------------------------------------------------------
+
+@main.route('/export/<kind>.<file_format>')
+def export(kind, file_format):
+  # streams a dump of venues, artists or shows, e.g. /export/shows.ndjson?from=2022-01-01&venue_id=3
+  if kind not in EXPORTS or file_format not in EXPORT_FORMATS:
+    abort(404)
+  try:
+    filters = parse_export_filters(request.args)
+  except ValueError:
+    abort(400)
+
+  return Response(
+    stream_with_context(generate_export(kind, file_format, filters)),
+    mimetype='text/csv' if file_format == 'csv' else 'application/x-ndjson',
+    headers={'Content-Disposition': f'attachment; filename={kind}.{file_format}'}
+  )
+
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
-
-
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
-#----------------------------------------------------------------------------#
-# Launch.
-#----------------------------------------------------------------------------#
-
-# Default port:
-if __name__ == '__main__':
-    app.run()
-
-# Or specify port manually:
-'''
-if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
-'''
@@ -0,0 +1,138 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError
+from datetime import datetime
+from flask import current_app, g, has_request_context
+from sqlalchemy.engine import make_url
+from instrumentation import current_metrics
+from loaders import detail_statements, venue_data, artist_data, load_venue, load_artist
+
+#----------------------------------------------------------------------------#
+# Detail-page data read concurrently through an asyncio engine.
+#----------------------------------------------------------------------------#
+
+BUILDERS = {'venue': venue_data, 'artist': artist_data}
+
+
+class AsyncEngines:
+    # one app's async engine for the primary, and one per read replica keyed on
+    # the replica's blocking engine (the one replica routing puts in g.replica)
+    __slots__ = ('primary', 'replicas')
+
+    def __init__(self, primary, replicas):
+        self.primary = primary
+        self.replicas = replicas
+
+
+class AsyncDetails:
+    # with ASYNC_DATABASE_URI set (postgresql+asyncpg://...), the queries of a
+    # venue/artist page -- entity row, genres, past shows, upcoming shows -- go
+    # out together, each on its own connection, so a page waits for the slowest
+    # of them rather than for their sum. This is a per-page latency change, not
+    # a throughput one: the engine runs on one event loop thread per worker
+    # process, and each request thread still blocks until its page's queries
+    # are done, so the server handles one request per thread as before. A
+    # replica-routed request reads from its replica, through an async engine
+    # made from SQLALCHEMY_REPLICA_URIS with the same driver. Without the
+    # setting, the blocking loaders are used.
+
+    def __init__(self, app=None):
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASYNC_DATABASE_URI', None)
+        app.config.setdefault('ASYNC_POOL_SIZE', 20)
+        app.config.setdefault('ASYNC_QUERY_TIMEOUT', 10)
+        primary, replicas = None, {}
+        if app.config['ASYNC_DATABASE_URI']:
+            drivername = make_url(app.config['ASYNC_DATABASE_URI']).drivername
+            primary = self._create_engine(app, app.config['ASYNC_DATABASE_URI'])
+            # after replicas.init_app, whose engines the routed requests carry
+            replicas = {
+                replica.engine: self._create_engine(app, replica.engine.url.set(drivername=drivername))
+                for replica in app.extensions['fyyur_replicas'].replicas
+            }
+        # the event loop thread is the process's, the engines the app's
+        app.extensions['fyyur_async_details'] = AsyncEngines(primary, replicas)
+
+    def _create_engine(self, app, url):
+        from sqlalchemy.ext.asyncio import create_async_engine
+        options = {'pool_pre_ping': True}
+        if app.config['ASYNC_POOL_SIZE']:
+            # up to four connections per request being loaded
+            options['pool_size'] = app.config['ASYNC_POOL_SIZE']
+        # no connection is opened here, so the engine survives a fork
+        return create_async_engine(url, **options)
+
+    @staticmethod
+    def engine(app=None):
+        # the app's async engine for the primary, None when ASYNC_DATABASE_URI is not set
+        return (app or current_app).extensions['fyyur_async_details'].primary
+
+    @staticmethod
+    def engines(app=None):
+        engines = (app or current_app).extensions['fyyur_async_details']
+        return [engines.primary, *engines.replicas.values()] if engines.primary is not None else []
+
+    @staticmethod
+    def _routed_engine():
+        # where the request's blocking reads go: its replica's engine, or the primary's
+        engines = current_app.extensions['fyyur_async_details']
+        replica = g.get('replica') if has_request_context() else None
+        return engines.replicas.get(replica, engines.primary) if replica is not None else engines.primary
+
+    def _event_loop(self):
+        # started on first use in each process, as threads do not survive a fork
+        with self._lock:
+            if self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='fyyur-async-details', daemon=True).start()
+                self._pid = os.getpid()
+            return self._loop
+
+    def run(self, coroutine):
+        # scheduled from an empty context, so the queries never run inside the
+        # request's: whatever the request should record, the coroutine passes on
+        future = contextvars.Context().run(asyncio.run_coroutine_threadsafe, coroutine, self._event_loop())
+        try:
+            return future.result(current_app.config['ASYNC_QUERY_TIMEOUT'])
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    async def _fetch(self, engine, statement):
+        async with engine.connect() as connection:
+            return (await connection.execute(statement)).all()
+
+    async def _gather(self, engine, statements, metrics):
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self._fetch(engine, statement) for statement in statements))
+        # the engine events see no request here, so the queries are counted
+        # into the request's metrics; they overlap, so the request waited on
+        # SQL for the time they took together
+        if metrics is not None:
+            metrics.queries += len(statements)
+            metrics.sql_seconds += time.perf_counter() - started
+        return results
+
+    def load(self, kind, entity_id, now=None):
+        # the same data as load_venue/load_artist, None when there is no such entity
+        engine = self._routed_engine()
+        if engine is None:
+            return (load_venue if kind == 'venue' else load_artist)(entity_id, now)
+
+        # statements are built here, where the app context is
+        entity, genres, past_shows, upcoming_shows = self.run(
+            self._gather(engine, detail_statements(kind, entity_id, now or datetime.utcnow()), current_metrics()))
+        if not entity:
+            return None
+        return BUILDERS[kind](entity[0], [genre for genre, in genres],
+                              [row._asdict() for row in past_shows], [row._asdict() for row in upcoming_shows])
+
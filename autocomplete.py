@@ -0,0 +1,245 @@
+import bisect
+import os
+import sys
+import threading
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, Venue, Artist, CacheVersion
+from cache import REBUILD_AUTOCOMPLETE, names_tag, table_tag, tag_versions
+
+#----------------------------------------------------------------------------#
+# In-process prefix index for typeahead.
+#----------------------------------------------------------------------------#
+
+# writes that may change the indexed names
+WATCHED_TAGS = [names_tag('venue'), names_tag('artist'), table_tag('venue'), table_tag('artist'), REBUILD_AUTOCOMPLETE]
+
+# rough per-entry cost of the tuple, list slot and dict slot around the strings
+ENTRY_OVERHEAD = 200
+
+# past this many changes at once (an import), the keys are sorted again
+# rather than each change being bisected into them
+SORT_THRESHOLD = 1000
+
+
+def normalize(name):
+    # accent-insensitive, case-insensitive, whitespace-collapsed form of a name
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+class PrefixIndex:
+    # sorted array of (normalized name, id) searched with bisect
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.truncated = False
+        self._keys = []
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _cost(self, key, name):
+        return sys.getsizeof(key) + sys.getsizeof(name) + ENTRY_OVERHEAD
+
+    @classmethod
+    def build(cls, max_bytes, rows):
+        # the entries of all the (id, name) rows that fit, and the keys sorted once
+        index = cls(max_bytes)
+        for entity_id, name in rows:
+            if not index._put(entity_id, name):
+                break
+        index._sort()
+        return index
+
+    def _put(self, entity_id, name):
+        key = normalize(name)
+        cost = self._cost(key, name)
+        if self.size_bytes + cost > self.max_bytes:
+            # keep serving what fits rather than growing past the ceiling
+            self.truncated = True
+            return False
+        self._entries[entity_id] = (key, name)
+        self.size_bytes += cost
+        return True
+
+    def _drop(self, entity_id):
+        entry = self._entries.pop(entity_id, None)
+        if entry is not None:
+            self.size_bytes -= self._cost(*entry)
+        return entry
+
+    def _sort(self):
+        self._keys = sorted((key, entity_id) for entity_id, (key, _) in self._entries.items())
+
+    def add(self, entity_id, name):
+        self.remove(entity_id)
+        if not self._put(entity_id, name):
+            return False
+        bisect.insort(self._keys, (self._entries[entity_id][0], entity_id))
+        return True
+
+    def remove(self, entity_id):
+        entry = self._drop(entity_id)
+        if entry is not None:
+            del self._keys[bisect.bisect_left(self._keys, (entry[0], entity_id))]
+
+    def update(self, rows, removed=()):
+        # applies changed (id, name) rows and removed ids
+        if len(rows) + len(removed) <= SORT_THRESHOLD:
+            for entity_id in removed:
+                self.remove(entity_id)
+            for entity_id, name in rows:
+                self.add(entity_id, name)
+            return
+        for entity_id in removed:
+            self._drop(entity_id)
+        for entity_id, name in rows:
+            self._drop(entity_id)
+            self._put(entity_id, name)
+        self._sort()
+
+    def lookup(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        results = []
+        position = bisect.bisect_left(self._keys, (prefix,))
+        while position < len(self._keys) and len(results) < limit:
+            key, entity_id = self._keys[position]
+            if not key.startswith(prefix):
+                break
+            results.append({'id': entity_id, 'name': self._entries[entity_id][1]})
+            position += 1
+        return results
+
+
+class NameIndexes:
+    # one app's indexes, and the process its watcher thread runs in
+    __slots__ = ('indexes', 'built_at', 'pid', 'lock')
+
+    def __init__(self):
+        self.indexes = {}
+        self.built_at = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+
+class Autocomplete:
+    # per-worker venue and artist name indexes, kept off the request path: a
+    # background thread builds them when the worker starts, then polls the
+    # cache tag versions every AUTOCOMPLETE_POLL_SECONDS. Once names were
+    # written by any worker or an import, it applies the venues/artists
+    # written since its last poll; only `flask fyyur rebuild-autocomplete`
+    # makes it scan the tables again. This worker's own writes also go
+    # straight in.
+
+    models = {'venue': Venue, 'artist': Artist}
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUTOCOMPLETE_MAX_BYTES', 64 * 1024 * 1024)
+        app.config.setdefault('AUTOCOMPLETE_POLL_SECONDS', 5)
+        app.config.setdefault('AUTOCOMPLETE_LIMIT', 10)
+        app.config.setdefault('AUTOCOMPLETE_CHANGE_MARGIN', 60)
+        app.extensions['fyyur_autocomplete'] = NameIndexes()
+
+    @staticmethod
+    def _state(app=None):
+        return (app or current_app).extensions['fyyur_autocomplete']
+
+    def rebuild(self):
+        # one column-projected query per kind; the new indexes are swapped in whole
+        max_bytes = current_app.config['AUTOCOMPLETE_MAX_BYTES']
+        indexes = {}
+        for kind, model in self.models.items():
+            index = PrefixIndex.build(max_bytes, db.session.query(model.id, model.name).yield_per(1000))
+            if index.truncated:
+                current_app.logger.warning(f'Autocomplete index for {kind} reached its {max_bytes} byte ceiling')
+            indexes[kind] = index
+        state = self._state()
+        with state.lock:
+            state.indexes = indexes
+            state.built_at = time.monotonic()
+        return indexes
+
+    def changes(self, kind, since):
+        # (rows, removed ids) of the venues/artists written since `since`:
+        # updated_at finds the inserted and renamed ones, the entity tags
+        # bumped since then the deleted ones
+        model = self.models[kind]
+        rows = db.session.query(model.id, model.name).filter(model.updated_at >= since).all()
+        tagged = {int(tag[len(kind) + 1:]) for tag, in db.session.query(CacheVersion.tag)
+                  .filter(CacheVersion.tag.like(f'{kind}:%'), CacheVersion.bumped_at >= since)}
+        if tagged:
+            tagged -= {entity_id for entity_id, in db.session.query(model.id).filter(model.id.in_(tagged))}
+        return rows, tagged
+
+    def refresh(self, since):
+        # applies the changes since `since` to the indexes in place
+        changes = {kind: self.changes(kind, since) for kind in self.models}
+        state = self._state()
+        with state.lock:
+            for kind, (rows, removed) in changes.items():
+                if kind in state.indexes:
+                    state.indexes[kind].update(rows, removed)
+
+    def start(self, app=None):
+        # once per process (threads do not survive a fork); gunicorn calls it
+        # from post_fork, other servers on the first lookup
+        app = app or current_app._get_current_object()
+        state = self._state(app)
+        with state.lock:
+            if state.pid == os.getpid():
+                return
+            state.pid = os.getpid()
+        threading.Thread(target=self._watch, args=(app,), name='fyyur-autocomplete', daemon=True).start()
+
+    def _watch(self, app):
+        seen = since = None
+        while True:
+            try:
+                with app.app_context():
+                    # read before the scan, so a write racing it is caught next time
+                    versions = tag_versions(WATCHED_TAGS)
+                    if versions != seen:
+                        # writes are looked for AUTOCOMPLETE_CHANGE_MARGIN seconds
+                        # before the last poll, for the time between a write and
+                        # its commit and for clock skew between servers
+                        started = datetime.utcnow() - timedelta(seconds=app.config['AUTOCOMPLETE_CHANGE_MARGIN'])
+                        if seen is None or versions[REBUILD_AUTOCOMPLETE] != seen[REBUILD_AUTOCOMPLETE]:
+                            self.rebuild()
+                        else:
+                            self.refresh(since)
+                        seen, since = versions, started
+            except Exception:
+                app.logger.exception('Autocomplete refresh failed')
+            time.sleep(app.config['AUTOCOMPLETE_POLL_SECONDS'])
+
+    def lookup(self, kind, prefix, limit=None):
+        # never queries the database; empty until the first build is done
+        self.start()
+        state = self._state()
+        with state.lock:
+            index = state.indexes.get(kind)
+            return index.lookup(prefix, limit or current_app.config['AUTOCOMPLETE_LIMIT']) if index else []
+
+    def add(self, kind, entity_id, name):
+        state = self._state()
+        with state.lock:
+            if kind in state.indexes:
+                state.indexes[kind].add(entity_id, name)
+
+    def remove(self, kind, entity_id):
+        state = self._state()
+        with state.lock:
+            if kind in state.indexes:
+                state.indexes[kind].remove(entity_id)
@@ -0,0 +1,88 @@
+"""Startup benchmark: how long a fresh worker takes to import the app and build it.
+
+Each run is a new interpreter, so nothing is warm: it times ``import app`` and
+``create_app()`` separately, then lists the slowest imports (``-X importtime``)
+so that a new top-level import of something heavy is easy to spot.
+
+    python -m benchmarks.startup --runs 10 --max-ms 400
+
+``--max-ms`` exits non-zero when the median import + factory time is over budget.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+built = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'create_app_ms': (built - imported) * 1000}))
+"""
+
+
+def probe_env():
+    # startup must not need a database or a real secret
+    env = dict(os.environ)
+    env.setdefault('SECRET_KEY', 'startup-benchmark')
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    return env
+
+
+def measure(runs):
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', PROBE], env=probe_env(), check=True,
+                                capture_output=True, text=True).stdout
+        timings.append(json.loads(output.splitlines()[-1]))
+    return {key: round(statistics.median(timing[key] for timing in timings), 1) for key in timings[0]}
+
+
+def slowest_imports(limit):
+    # (cumulative microseconds, module) of the modules app.py imports, largest
+    # first; -X importtime indents a module two spaces per nesting level and
+    # prints it after its own imports
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], env=probe_env(),
+                            check=True, capture_output=True, text=True).stderr
+    children = []
+    for line in stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((int(fields[1]), name.strip()))
+        elif depth == 0:
+            if name.strip() == 'app':
+                return sorted(children, reverse=True)[:limit]
+            children = []
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='number of slowest imports to list')
+    parser.add_argument('--max-ms', type=float, help='fail when import + create_app exceeds this median')
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    total = round(result['import_ms'] + result['create_app_ms'], 1)
+    print(f"import app: {result['import_ms']}ms, create_app(): {result['create_app_ms']}ms, "
+          f"total {total}ms (median of {args.runs})")
+    for cumulative, name in slowest_imports(args.top):
+        print(f'{cumulative / 1000:8.1f}ms  {name}')
+
+    if args.max_ms is not None and total > args.max_ms:
+        print(f'Startup took {total}ms, over the {args.max_ms}ms budget')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
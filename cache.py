@@ -0,0 +1,406 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+from models import db, Venue, Artist, Show, CacheVersion
+from replicas import use_primary
+
+#----------------------------------------------------------------------------#
+# Tagged cache of page data, invalidated when the session commits.
+#----------------------------------------------------------------------------#
+
+# session.info key under which tags touched by the current transaction pile up
+PENDING_TAGS = 'cache_tags'
+
+# session.info key of the tags bumped by the commit in progress
+COMMITTED_TAGS = 'cache_committed_tags'
+
+# what Cache._lookup returns when there is no fresh entry
+MISS = object()
+
+
+def entity_tag(kind, entity_id):
+    return f'{kind}:{entity_id}'
+
+
+def area_tag(state, city):
+    return f'area:{state}/{city}'
+
+
+def period_tag(start_time):
+    # shows starting in a UTC month, for the calendar windows covering it
+    return f'shows:{start_time:%Y-%m}'
+
+
+def names_tag(kind):
+    # bumped when venue/artist names may have changed; the autocomplete indexes
+    # of every worker watch it
+    return f'names:{kind}'
+
+
+# bumped by `flask fyyur rebuild-autocomplete` alone
+REBUILD_AUTOCOMPLETE = 'autocomplete'
+
+
+def table_tag(table):
+    # bumped by bulk statements that do not say which entities they touch
+    return f'table:{table}'
+
+
+def _previous(instance, attribute):
+    history = inspect(instance).attrs[attribute].history
+    return history.deleted[0] if history.deleted else getattr(instance, attribute)
+
+
+def instance_tags(instance):
+    # tags of the cached data a flushed venue, artist or show may appear in
+    if isinstance(instance, Venue):
+        # a venue moved to another area leaves its old area as well
+        return {
+            entity_tag('venue', instance.id), 'venues', names_tag('venue'),
+            area_tag(instance.state, instance.city),
+            area_tag(_previous(instance, 'state'), _previous(instance, 'city')),
+        }
+    if isinstance(instance, Artist):
+        return {entity_tag('artist', instance.id), 'artists', names_tag('artist')}
+    if isinstance(instance, Show):
+        return {
+            entity_tag('venue', instance.venue_id), entity_tag('artist', instance.artist_id),
+            entity_tag('venue', _previous(instance, 'venue_id')), entity_tag('artist', _previous(instance, 'artist_id')),
+            period_tag(instance.start_time), period_tag(_previous(instance, 'start_time')),
+            'shows',
+        }
+    return set()
+
+
+def show_tags(rows):
+    # cache_tags for a bulk insert of show rows
+    tags = {'shows'}
+    for row in rows:
+        tags.update((entity_tag('venue', row['venue_id']), entity_tag('artist', row['artist_id']),
+                     period_tag(row['start_time'])))
+    return tags
+
+
+def invalidate_on_commit(session, tags):
+    # for writes the session events cannot see, such as raw SQL
+    session.info.setdefault(PENDING_TAGS, set()).update(tags)
+
+
+#----------------------------------------------------------------------------#
+# Tag versions.
+#----------------------------------------------------------------------------#
+
+def tag_versions(tags):
+    # {tag: version} in one primary-key lookup, read where the session reads:
+    # a replica-routed request sees the versions of the data its replica has
+    tags = list(tags)
+    if not tags:
+        return {}
+    rows = dict(db.session.query(CacheVersion.tag, CacheVersion.version).filter(CacheVersion.tag.in_(tags)))
+    return {tag: rows.get(tag, 0) for tag in tags}
+
+
+def bump_versions(session, tags):
+    # in the writing transaction itself, so the new versions become visible to
+    # every worker and process exactly when the write does, and roll back with it
+    insert = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}[db.engine.dialect.name]
+    now = datetime.utcnow()
+    # rows are locked in tag order, so concurrent writers cannot deadlock
+    statement = insert(CacheVersion).values([
+        {'tag': tag, 'version': 1, 'bumped_at': now} for tag in sorted(set(tags))
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=['tag'],
+        set_={'version': CacheVersion.version + 1, 'bumped_at': statement.excluded.bumped_at},
+    )
+    session.execute(statement.execution_options(cache_tags=[]))
+
+
+class VersionSnapshot:
+    # per-worker copy of the tag versions last read from the primary, so a hit
+    # costs no query: a tag is re-read once its copy is older than ttl seconds,
+    # or at once after this worker commits a write bumping it. Writes by other
+    # workers are seen within ttl seconds.
+
+    def __init__(self, ttl, max_tags):
+        self.ttl = ttl
+        self.max_tags = max_tags
+        self._versions = {}
+        self._forgotten = 0
+        self._lock = threading.Lock()
+
+    def get(self, tags):
+        now = time.monotonic()
+        with self._lock:
+            known = {tag: self._versions.get(tag) for tag in tags}
+            forgotten = self._forgotten
+        versions = {tag: entry[0] for tag, entry in known.items() if entry and now - entry[1] < self.ttl}
+        stale = [tag for tag in known if tag not in versions]
+        if stale:
+            with use_primary():
+                read = tag_versions(stale)
+            versions.update(read)
+            with self._lock:
+                if len(self._versions) + len(read) > self.max_tags:
+                    self._versions = {tag: entry for tag, entry in self._versions.items() if now - entry[1] < self.ttl}
+                # a commit forgetting tags while they were read may not be in them
+                if forgotten == self._forgotten:
+                    self._versions.update((tag, (version, now)) for tag, version in read.items())
+        return versions
+
+    def forget(self, tags):
+        with self._lock:
+            self._forgotten += 1
+            for tag in tags:
+                self._versions.pop(tag, None)
+
+    def clear(self):
+        with self._lock:
+            self._forgotten += 1
+            self._versions.clear()
+
+
+#----------------------------------------------------------------------------#
+# Tiers.
+#----------------------------------------------------------------------------#
+
+class LocalTier:
+    # per-worker LRU of (expires at, tag versions, value), bounded in entries
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, ttl=None):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisTier:
+    # values shared by all workers, so a miss filled by one serves the others
+
+    def __init__(self, client, prefix):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, prefix):
+        if redis is None:
+            raise RuntimeError('CACHE_REDIS_URL is set but the redis package is not installed')
+        return cls(redis.Redis.from_url(url), prefix)
+
+    def get(self, key):
+        raw = self.client.get(f'{self.prefix}value:{key}')
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, entry, ttl):
+        self.client.set(f'{self.prefix}value:{key}', pickle.dumps(entry, pickle.HIGHEST_PROTOCOL), ex=max(1, int(ttl)))
+
+
+class Tiers:
+    # one app's cache tiers, and its snapshot of the tag versions
+    __slots__ = ('local', 'shared', 'versions')
+
+    def __init__(self, local, shared, versions):
+        self.local = local
+        self.shared = shared
+        self.versions = versions
+
+
+#----------------------------------------------------------------------------#
+# Cache.
+#----------------------------------------------------------------------------#
+
+class Cache:
+    # read-through cache for the data the pages are built from. Every entry
+    # records the versions of its tags when it was filled; a commit touching a
+    # tag bumps its version in the cache_version table, in the same
+    # transaction, which turns the entries carrying it into misses in every
+    # worker (and after writes by the CLI). Hits are checked against the
+    # worker's VersionSnapshot, so they cost no query once it is warm.
+    # The session events below collect the tags, so write paths do not have to:
+    #   - flushed venues/artists/shows tag themselves (instance_tags)
+    #   - bulk INSERT/UPDATE/DELETE statements use their cache_tags execution
+    #     option, or the tag of their whole table when they have none
+
+    def __init__(self, app=None, db=None):
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault('CACHE_ENABLED', True)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 2048)
+        app.config.setdefault('CACHE_TTL', 300)
+        app.config.setdefault('CACHE_VERSION_TTL', 1)
+        app.config.setdefault('CACHE_REDIS_URL', None)
+        app.config.setdefault('CACHE_KEY_PREFIX', 'fyyur:')
+        shared = None
+        if app.config['CACHE_REDIS_URL']:
+            shared = RedisTier.from_url(app.config['CACHE_REDIS_URL'], app.config['CACHE_KEY_PREFIX'])
+        # the tiers are the app's, so every app created by the factory has its own
+        app.extensions['fyyur_cache'] = Tiers(
+            LocalTier(app.config['CACHE_MAX_ENTRIES']), shared,
+            VersionSnapshot(app.config['CACHE_VERSION_TTL'], 16 * app.config['CACHE_MAX_ENTRIES']))
+
+        for name, listener in (
+            ('after_flush', self._collect_flushed),
+            ('do_orm_execute', self._collect_bulk),
+            ('before_commit', self._bump_pending),
+            ('after_commit', self._forget_committed),
+            ('after_transaction_end', self._drop_pending),
+        ):
+            if not event.contains(db.session, name, listener):
+                event.listen(db.session, name, listener)
+
+    @staticmethod
+    def _tiers():
+        return current_app.extensions['fyyur_cache']
+
+    def _lookup(self, key):
+        # the cached value, or MISS
+        if not current_app.config['CACHE_ENABLED']:
+            return MISS
+        tiers = self._tiers()
+        entry = tiers.local.get(key)
+        if entry is None and tiers.shared is not None:
+            entry = tiers.shared.get(key)
+        if entry is not None and entry[0] > time.time() and self._fresh(entry[1]):
+            tiers.local.set(key, entry)
+            return entry[2]
+        return MISS
+
+    @staticmethod
+    def _known_tags(tags):
+        # the tags known before the value is built; callable tags are asked
+        # with None, and answer with stand-ins for the ones the value will add
+        return set(tags(None) if callable(tags) else tags)
+
+    def _store(self, key, value, tags, expires_at, before):
+        tags = set(tags(value) if callable(tags) else tags)
+        ttl = current_app.config['CACHE_TTL']
+        expiry = expires_at(value) if callable(expires_at) else expires_at
+        if expiry is not None:
+            ttl = min(ttl, (expiry - datetime.utcnow()).total_seconds())
+
+        # read again where the value was read: a commit while it was being
+        # built has bumped one of the tags read before
+        versions = tag_versions(tags | set(before))
+        if ttl > 0 and all(versions[tag] == version for tag, version in before.items()):
+            entry = (time.time() + ttl, {tag: versions[tag] for tag in tags}, value)
+            tiers = self._tiers()
+            tiers.local.set(key, entry)
+            if tiers.shared is not None:
+                tiers.shared.set(key, entry, ttl)
+
+    def cached(self, key, producer, tags=(), expires_at=None):
+        # producer() builds the value on a miss. tags and expires_at may be
+        # callables of the value, for tags (or an expiry) that depend on it.
+        value = self._lookup(key)
+        if value is not MISS:
+            return value
+        if not current_app.config['CACHE_ENABLED']:
+            return producer()
+
+        # the value is filed under versions read from the session it is read
+        # from, so one built on a lagging replica only serves until the
+        # snapshot moves past them
+        before = tag_versions(self._known_tags(tags))
+        value = producer()
+        self._store(key, value, tags, expires_at, before)
+        return value
+
+    def cached_items(self, key, producer, tags=()):
+        # like cached() for a producer returning an iterator: on a miss the items
+        # are handed on as they are read, so a streamed page still streams, and
+        # the list is stored once the iterator is exhausted
+        value = self._lookup(key)
+        if value is not MISS:
+            return value
+        if not current_app.config['CACHE_ENABLED']:
+            return producer()
+        return self._fill_items(key, producer, tags)
+
+    def _fill_items(self, key, producer, tags):
+        before = tag_versions(self._known_tags(tags))
+        items = []
+        for item in producer():
+            items.append(item)
+            yield item
+        self._store(key, items, tags, None, before)
+
+    def _fresh(self, versions):
+        # an entry filed by a worker ahead of this one's snapshot is newer still
+        current = self._tiers().versions.get(versions)
+        return all(version >= current[tag] for tag, version in versions.items())
+
+    def clear(self):
+        # drops this worker's entries; shared entries still go stale by tag
+        tiers = self._tiers()
+        tiers.local.clear()
+        tiers.versions.clear()
+
+    # Session events
+
+    def _collect_flushed(self, session, flush_context):
+        tags = set()
+        for instance in (*session.new, *session.dirty, *session.deleted):
+            tags |= instance_tags(instance)
+        invalidate_on_commit(session, tags)
+
+    def _collect_bulk(self, state):
+        if not (state.is_insert or state.is_update or state.is_delete):
+            return
+        tags = state.execution_options.get('cache_tags')
+        if tags is None:
+            tags = [table_tag(state.statement.table.name)]
+        invalidate_on_commit(state.session, tags)
+
+    def _bump_pending(self, session):
+        # flushed first, so the tags of the objects still pending are in
+        session.flush()
+        tags = session.info.pop(PENDING_TAGS, None)
+        if tags:
+            bump_versions(session, tags)
+            session.info[COMMITTED_TAGS] = tags
+
+    def _forget_committed(self, session):
+        # this worker's next hits re-read what it just wrote
+        tags = session.info.pop(COMMITTED_TAGS, None)
+        if tags and has_app_context() and 'fyyur_cache' in current_app.extensions:
+            self._tiers().versions.forget(tags)
+
+    def _drop_pending(self, session, transaction):
+        # whatever is left when the outermost transaction ends was rolled back
+        if transaction.parent is None:
+            session.info.pop(PENDING_TAGS, None)
+            session.info.pop(COMMITTED_TAGS, None)
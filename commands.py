@@ -0,0 +1,184 @@
+import json
+import click
+from flask.cli import AppGroup
+
+#----------------------------------------------------------------------------#
+# `flask fyyur ...` maintenance commands.
+#----------------------------------------------------------------------------#
+
+fyyur_cli = AppGroup('fyyur', help='Fyyur maintenance commands.')
+
+
+@fyyur_cli.command('rebuild-autocomplete')
+def rebuild_autocomplete():
+    """Make every web worker rebuild its typeahead indexes."""
+    from flask import current_app
+    from cache import REBUILD_AUTOCOMPLETE, invalidate_on_commit
+    from models import db
+
+    # the workers poll the tag versions and rebuild once they see the bump
+    invalidate_on_commit(db.session, [REBUILD_AUTOCOMPLETE])
+    db.session.commit()
+    click.echo(f"Workers rebuild their autocomplete indexes within "
+               f"{current_app.config['AUTOCOMPLETE_POLL_SECONDS']} seconds")
+
+
+@fyyur_cli.command('rebuild-facets')
+def rebuild_facets_command():
+    """Recount the listing facets from the venue and artist tables."""
+    from facets import FACETS, rebuild_facets
+    from models import db
+
+    for kind in FACETS:
+        rebuild_facets(kind)
+    db.session.commit()
+    click.echo(f'Rebuilt facet counts for {", ".join(FACETS)}')
+
+
+@fyyur_cli.command('roll-counters')
+def roll_counters_command():
+    """Move started shows from upcoming to past counts (run every minute from cron)."""
+    from counters import roll_counters
+    from models import db
+
+    rolled = roll_counters()
+    db.session.commit()
+    click.echo(', '.join(f'{count} {kind}s recounted' for kind, count in rolled.items()))
+
+
+@fyyur_cli.command('reconcile-counters')
+@click.option('--dry-run', is_flag=True, help='Only report venues/artists whose counters drifted.')
+def reconcile_counters_command(dry_run):
+    """Detect and repair drift between the show counters and the show table."""
+    from datetime import datetime
+    from counters import COUNTERS, counter_drift, refresh_counters
+    from models import db
+
+    now = datetime.utcnow()
+    for kind, spec in COUNTERS.items():
+        drifted = counter_drift(kind, now=now)
+        click.echo(f'{kind}: {len(drifted)} drifted')
+        if drifted:
+            click.echo('  ids: ' + ', '.join(str(entity_id) for entity_id in drifted[:20]) + (' ...' if len(drifted) > 20 else ''))
+        if drifted and not dry_run:
+            refresh_counters(kind, spec['model'].id.in_(drifted), now=now)
+    if not dry_run:
+        db.session.commit()
+
+
+@fyyur_cli.command('partitions')
+@click.option('--ahead', default=3, show_default=True, help='Months of partitions to create past the current one.')
+@click.option('--retain', default=24, show_default=True, help='Months of past partitions to keep attached.')
+@click.option('--archive-schema', default='archive', show_default=True, help='Schema detached partitions move to.')
+@click.option('--drop', is_flag=True, help='Drop detached partitions instead of archiving them.')
+def partitions_command(ahead, retain, archive_schema, drop):
+    """Create upcoming monthly show partitions and archive old ones (run daily)."""
+    import re
+    from datetime import datetime
+    from models import db
+    from partitions import ensure_partitions, archive_partitions, month_start, partition_name, upcoming_partitions_scanned
+
+    if db.engine.dialect.name != 'postgresql':
+        raise click.ClickException('The show table is only partitioned on PostgreSQL')
+    if not re.match(r'^[a-z_][a-z0-9_]*$', archive_schema):
+        raise click.BadParameter(f'invalid schema name {archive_schema!r}', param_hint='--archive-schema')
+
+    created = ensure_partitions(ahead=ahead)
+    archived = archive_partitions(retain=retain, schema=archive_schema, drop=drop)
+    db.session.commit()
+    click.echo(f'Created: {", ".join(created) or "none"}')
+    click.echo(f'{"Dropped" if drop else "Archived to " + archive_schema}: {", ".join(archived) or "none"}')
+
+    # upcoming-show queries must be pruned to the current and future months
+    current = partition_name(month_start(datetime.utcnow()))
+    scanned = upcoming_partitions_scanned()
+    stale = [name for name in scanned if name != 'show_default' and name < current]
+    click.echo(f'Upcoming queries scan: {", ".join(scanned)}')
+    if stale:
+        raise click.ClickException(f'Upcoming queries are not pruned: {", ".join(stale)}')
+
+
+@fyyur_cli.command('rename-genre')
+@click.argument('old_name')
+@click.argument('new_name')
+def rename_genre_command(old_name, new_name):
+    """Rename a genre for every venue and artist that carries it."""
+    from genres import rename_genre
+    from models import db
+
+    if not rename_genre(old_name, new_name):
+        raise click.ClickException(f'No genre named {old_name!r}, or {new_name!r} already exists')
+    db.session.commit()
+    click.echo(f'Renamed {old_name} to {new_name}')
+
+
+@fyyur_cli.command('warm-templates')
+def warm_templates_command():
+    """Compile every template into the Jinja bytecode cache."""
+    from flask import current_app
+    from rendering import warm_templates
+
+    names = warm_templates(current_app)
+    click.echo(f'Compiled {len(names)} templates into {current_app.config["JINJA_BYTECODE_CACHE_DIR"]}')
+
+
+@fyyur_cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']),
+              help='Input format; guessed from the file extension when omitted.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows written per transaction.')
+@click.option('--rejects', type=click.File('w', encoding='utf-8'),
+              help='Write rejected rows to this file as NDJSON.')
+def import_command(kind, source, file_format, chunk_size, rejects):
+    """Bulk import venues, artists or shows from a CSV or NDJSON file."""
+    from importer import import_records, read_records
+
+    file_format = file_format or ('csv' if source.name.endswith('.csv') else 'ndjson')
+
+    def on_reject(line_number, record, reason):
+        if rejects is not None:
+            rejects.write(json.dumps({'line': line_number, 'reason': reason, 'record': record}) + '\n')
+        else:
+            click.echo(f'line {line_number}: {reason}', err=True)
+
+    imported, rejected = import_records(kind, read_records(source, file_format),
+                                        chunk_size=chunk_size, on_reject=on_reject)
+    click.echo(f'Imported {imported} {kind}, rejected {rejected}')
+
+
+@fyyur_cli.command('export')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), default='ndjson', show_default=True)
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='Defaults to stdout.')
+@click.option('--from', 'start', help='Shows starting at or after this ISO date/time.')
+@click.option('--to', 'end', help='Shows starting before this ISO date/time.')
+@click.option('--venue-id', type=int, help='Only shows at this venue.')
+@click.option('--artist-id', type=int, help='Only shows of this artist.')
+def export_command(kind, file_format, output, start, end, venue_id, artist_id):
+    """Stream venues, artists or shows to CSV or NDJSON."""
+    from exporter import generate_export, parse_filters
+
+    try:
+        filters = parse_filters({'from': start, 'to': end, 'venue_id': venue_id, 'artist_id': artist_id})
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+    for chunk in generate_export(kind, file_format, filters):
+        output.write(chunk)
+
+
+@fyyur_cli.command('explain-indexes')
+def explain_indexes():
+    """Check that the planner uses the performance indexes for the app's queries."""
+    from models import db
+    from query_plans import check_indexes
+
+    with db.engine.connect() as connection:
+        results = check_indexes(connection)
+    for description, expected, used, plan in results:
+        click.echo(f'{"ok  " if used else "FAIL"} {description}: {", ".join(used) or "expected " + " or ".join(expected)}')
+        if not used:
+            click.echo(plan)
+
+    if not all(used for _, _, used, _ in results):
+        raise SystemExit(1)
@@ -0,0 +1,109 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import g, make_response, request, session
+from models import db, Show, CacheVersion
+from replicas import use_primary
+from loaders import venue_listing_tags, artist_listing_tags, detail_tags, shows_page_tags
+
+#----------------------------------------------------------------------------#
+# Conditional GET (ETag / Last-Modified / 304).
+#----------------------------------------------------------------------------#
+
+def _scalar(query):
+    return query.scalar_subquery()
+
+
+def _tag_column(tag, column):
+    return _scalar(db.session.query(column).filter(CacheVersion.tag == tag))
+
+
+def _next_show(*criteria):
+    # pages split shows into past and upcoming, so they also change when "now"
+    # passes the next start time
+    return _scalar(db.session.query(db.func.min(Show.start_time)).filter(Show.start_time > datetime.utcnow(), *criteria))
+
+
+def _last_started(*criteria):
+    # ... and last changed that way when the latest show started
+    return _scalar(db.session.query(db.func.max(Show.start_time)).filter(Show.start_time <= datetime.utcnow(), *criteria))
+
+
+def _version(tags, *others, changed_at=None):
+    # the versions of the cache tags a page depends on -- bumped in the writing
+    # transaction by every write the page cache sees -- each one primary-key
+    # lookup in cache_version, read with the other values in one round trip.
+    # They are read on the primary, as the page cache checks its entries
+    # against the primary's versions. changed_at is when the page last changed
+    # other than by a write. Returns (validator values, last modified).
+    tags = sorted(set(tags))
+    with use_primary():
+        row = db.session.query(
+            *(_tag_column(tag, CacheVersion.version) for tag in tags),
+            *(_tag_column(tag, CacheVersion.bumped_at) for tag in tags),
+            *others,
+            *([changed_at] if changed_at is not None else []),
+        ).one()
+    versions = tuple(version or 0 for version in row[:len(tags)])
+    changes = [value for value in row[len(tags):2 * len(tags)] if value is not None]
+    if changed_at is not None and row[-1] is not None:
+        changes.append(row[-1])
+    values = row[2 * len(tags):len(row) - (changed_at is not None)]
+    return versions + tuple(values), max(changes) if changes else None
+
+
+def _detail_version(kind, entity_id):
+    key = Show.venue_id if kind == 'venue' else Show.artist_id
+    return _version(detail_tags(kind, entity_id, None), _next_show(key == entity_id),
+                    changed_at=_last_started(key == entity_id))
+
+
+def venue_version(venue_id):
+    return _detail_version('venue', venue_id)
+
+
+def artist_version(artist_id):
+    return _detail_version('artist', artist_id)
+
+
+def venues_version():
+    # the listing reads the maintained counters, whose updates bump 'venues'
+    return _version(venue_listing_tags(None))
+
+
+def artists_version():
+    return _version(artist_listing_tags(None))
+
+
+def shows_version():
+    return _version(shows_page_tags(None))
+
+
+def conditional(version):
+    # answers 304 Not Modified from one cheap version lookup when the client's
+    # validator still matches, without running the view's queries or rendering
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # pages carrying flashed messages are never served from a validator
+            if '_flashes' in session:
+                return view(**kwargs)
+
+            values, last_modified = version(**kwargs)
+            # rendered dates depend on the request's locale and timezone as well
+            etag = hashlib.sha1(repr((values, g.get('locale'), g.get('timezone_name'))).encode()).hexdigest()
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = (last_modified is not None and request.if_modified_since is not None
+                    and last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None))
+
+            response = make_response('', 304) if not_modified else make_response(view(**kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag, weak=True)
+                if last_modified is not None:
+                    response.last_modified = last_modified
+                response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,54 @@
+from datetime import datetime
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Upcoming/past show counters on venues and artists.
+#----------------------------------------------------------------------------#
+
+COUNTERS = {
+    'venue': {'model': Venue, 'key': Show.venue_id},
+    'artist': {'model': Artist, 'key': Show.artist_id},
+}
+
+
+def computed_counters(kind, now):
+    # the counters recounted from the show table, as correlated subqueries
+    # served by the (venue_id|artist_id, start_time) indexes
+    model = COUNTERS[kind]['model']
+    key = COUNTERS[kind]['key']
+
+    def shows(column, *criteria):
+        return db.session.query(column).filter(key == model.id, *criteria).scalar_subquery()
+
+    return {
+        model.upcoming_shows_count: shows(db.func.count(Show.id), Show.start_time > now),
+        model.past_shows_count: shows(db.func.count(Show.id), Show.start_time <= now),
+        model.next_show_at: shows(db.func.min(Show.start_time), Show.start_time > now),
+    }
+
+
+def refresh_counters(kind, *criteria, now=None):
+    # set-based recount of the venues/artists matching criteria; returns the row count.
+    # Only the listings read the counters, so only their cache entries go stale.
+    model = COUNTERS[kind]['model']
+    statement = db.update(model).where(*criteria) \
+        .values(computed_counters(kind, now or datetime.utcnow())) \
+        .execution_options(synchronize_session=False, cache_tags=[f'{kind}s'])
+    return db.session.execute(statement).rowcount
+
+
+def roll_counters(now=None):
+    # moves started shows from upcoming to past: only the venues/artists whose
+    # next show has started are recounted (ix_*_next_show_at)
+    now = now or datetime.utcnow()
+    return {kind: refresh_counters(kind, spec['model'].next_show_at <= now, now=now)
+            for kind, spec in COUNTERS.items()}
+
+
+def counter_drift(kind, now=None):
+    # ids of the venues/artists whose stored counters differ from a recount
+    model = COUNTERS[kind]['model']
+    computed = computed_counters(kind, now or datetime.utcnow())
+    return [entity_id for entity_id, in db.session.query(model.id).filter(db.or_(
+        *(column.is_distinct_from(value) for column, value in computed.items())
+    )).order_by(model.id)]
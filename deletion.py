@@ -0,0 +1,94 @@
+from models import db, Venue, Artist, Show, Booking, venue_genre, artist_genre
+from counters import refresh_counters
+from facets import FACETS, adjust_facets, facet_values
+from genres import genre_names
+from cache import entity_tag, area_tag, names_tag, period_tag
+
+#----------------------------------------------------------------------------#
+# Set-based deletes of venues and artists, their shows going in chunks.
+#----------------------------------------------------------------------------#
+
+DELETES = {
+    'venue': {'model': Venue, 'link': venue_genre, 'key': Show.venue_id, 'other': 'artist', 'other_model': Artist},
+    'artist': {'model': Artist, 'link': artist_genre, 'key': Show.artist_id, 'other': 'venue', 'other_model': Venue},
+}
+
+
+def _delete_shows(kind, ids, limit=None):
+    # deletes up to `limit` shows of the given venues/artists, with their
+    # bookings, and recounts the other side's counters; returns how many went
+    spec = DELETES[kind]
+    other_key = Show.venue_id if spec['other'] == 'venue' else Show.artist_id
+    query = db.session.query(Show.id, Show.start_time, other_key).filter(spec['key'].in_(ids))
+    if limit is not None:
+        query = query.order_by(spec['key'], Show.start_time).limit(limit)
+    rows = query.all()
+    if not rows:
+        return 0
+
+    show_ids = [row[0] for row in rows]
+    start_times = [row[1] for row in rows]
+    others = {row[2] for row in rows}
+    db.session.execute(db.delete(Booking).where(Booking.show_id.in_(show_ids))
+        .execution_options(synchronize_session=False, cache_tags=[]))
+    # the start_time range lets PostgreSQL prune the partitions it probes
+    db.session.execute(db.delete(Show)
+        .where(Show.id.in_(show_ids), Show.start_time.between(min(start_times), max(start_times)))
+        .execution_options(synchronize_session=False, cache_tags=[
+            'shows', *(entity_tag(kind, entity_id) for entity_id in ids),
+            *(entity_tag(spec['other'], other_id) for other_id in others),
+            *{period_tag(start_time) for start_time in start_times},
+        ]))
+    refresh_counters(spec['other'], spec['other_model'].id.in_(others))
+    return len(rows)
+
+
+def _deleted_facets(kind, ids):
+    # the facet values the deleted venues/artists contribute, read column-wise
+    model = DELETES[kind]['model']
+    seeking = getattr(model, FACETS[kind]['seeking'])
+    names = genre_names(kind, ids)
+    removed = []
+    for entity_id, state, seeks in db.session.query(model.id, model.state, seeking).filter(model.id.in_(ids)):
+        removed += facet_values(kind, names.get(entity_id, []), state, seeks)
+    return removed
+
+
+def delete_entities(kind, ids, chunk_size=5000):
+    # deletes the venues/artists with the given ids and returns
+    # {'deleted': [ids found], 'shows': number of shows deleted}.
+    # Shows go first, chunk_size at a time, each chunk in its own transaction so
+    # no lock is held for long and no rows pile up in memory; an interrupted
+    # delete leaves the entities in place and can simply be repeated. The
+    # entities themselves go in one last transaction with their remaining shows.
+    spec = DELETES[kind]
+    model = spec['model']
+    ids = [entity_id for entity_id, in db.session.query(model.id).filter(model.id.in_(set(ids))).order_by(model.id)]
+    db.session.commit()
+    if not ids:
+        return {'deleted': [], 'shows': 0}
+
+    shows = 0
+    while True:
+        count = _delete_shows(kind, ids, chunk_size)
+        db.session.commit()
+        shows += count
+        if count < chunk_size:
+            break
+
+    # shows scheduled since the last chunk, then the entities
+    shows += _delete_shows(kind, ids)
+    adjust_facets(kind, removed=_deleted_facets(kind, ids))
+    tags = [f'{kind}s', names_tag(kind), *(entity_tag(kind, entity_id) for entity_id in ids)]
+    if kind == 'venue':
+        tags += [area_tag(state, city) for state, city in
+                 db.session.query(Venue.state, Venue.city).filter(Venue.id.in_(ids)).distinct()]
+    link = spec['link']
+    db.session.execute(db.delete(Booking).where(getattr(Booking, f'{kind}_id').in_(ids))
+        .execution_options(synchronize_session=False, cache_tags=[]))
+    db.session.execute(db.delete(link).where(link.c[f'{kind}_id'].in_(ids))
+        .execution_options(synchronize_session=False, cache_tags=[]))
+    db.session.execute(db.delete(model).where(model.id.in_(ids))
+        .execution_options(synchronize_session=False, cache_tags=tags))
+    db.session.commit()
+    return {'deleted': ids, 'shows': shows}
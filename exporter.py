@@ -0,0 +1,106 @@
+import csv
+import io
+from datetime import datetime
+from models import db, Venue, Artist, Show
+from serializers import dumps_text
+from genres import with_genre_names
+
+#----------------------------------------------------------------------------#
+# Streaming export of the catalogue and show history.
+#----------------------------------------------------------------------------#
+
+EXPORTS = {
+    'venues': Venue,
+    'artists': Artist,
+    'shows': Show,
+}
+
+# kinds whose rows carry a genres list from the genre link tables
+GENRE_KINDS = {'venues': 'venue', 'artists': 'artist'}
+
+FORMATS = ('csv', 'ndjson')
+
+# rows fetched per round trip from the server-side cursor
+BATCH_SIZE = 2000
+
+
+def parse_filters(args):
+    # date-range and venue/artist filters; raises ValueError on malformed values
+    filters = {}
+    for key in ('from', 'to'):
+        if args.get(key):
+            filters[key] = datetime.fromisoformat(args[key])
+    for key in ('venue_id', 'artist_id'):
+        if args.get(key):
+            filters[key] = int(args[key])
+    return filters
+
+
+def export_query(kind, filters=None):
+    model = EXPORTS[kind]
+    filters = filters or {}
+    query = db.session.query(*model.__table__.columns)
+
+    if kind == 'shows':
+        # served by the (start_time, id), (venue_id, start_time) and (artist_id, start_time) indexes
+        if 'from' in filters:
+            query = query.filter(Show.start_time >= filters['from'])
+        if 'to' in filters:
+            query = query.filter(Show.start_time < filters['to'])
+        if 'venue_id' in filters:
+            query = query.filter(Show.venue_id == filters['venue_id'])
+        if 'artist_id' in filters:
+            query = query.filter(Show.artist_id == filters['artist_id'])
+        query = query.order_by(Show.start_time, Show.id)
+    else:
+        query = query.order_by(model.id)
+
+    # server-side cursor: rows arrive in batches instead of as one result set
+    return query.yield_per(BATCH_SIZE)
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return ';'.join(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def export_rows(kind, filters=None):
+    rows = export_query(kind, filters)
+    if kind not in GENRE_KINDS:
+        return rows
+    # the id is the first column of venue and artist
+    rows = with_genre_names(GENRE_KINDS[kind], rows, id_index=0, batch_size=BATCH_SIZE)
+    return (tuple(row) + (genres,) for row, genres in rows)
+
+
+def generate_export(kind, file_format, filters=None):
+    # yields the export in chunks; memory stays flat whatever the row count
+    columns = [column.name for column in EXPORTS[kind].__table__.columns]
+    if kind in GENRE_KINDS:
+        columns.append('genres')
+    rows = export_rows(kind, filters)
+
+    if file_format == 'ndjson':
+        lines = []
+        for row in rows:
+            lines.append(dumps_text(dict(zip(columns, row))))
+            if len(lines) == BATCH_SIZE:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_csv_value(value) for value in row])
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -1,3 +1,4 @@
+import os
 from fabric.api import local, settings, abort
 from fabric.contrib.console import confirm
 
@@ -6,13 +7,26 @@ from fabric.contrib.console import confirm
 
 def test():
     with settings(warn_only=True):
-        result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
-        )
+        result = local("python -m pytest")
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
 
+def bench(database_url, shows=10000, baseline='benchmarks/baseline.json'):
+    # seeded route benchmark; fails when an endpoint regressed against the baseline
+    command = "python -m benchmarks.routes {} --shows {} --reset --output benchmarks/latest.json".format(
+        database_url, shows
+    )
+    if os.path.exists(baseline):
+        command += " --compare {}".format(baseline)
+    local(command)
+
+
+def startup(max_ms=600):
+    # fails when a fresh worker takes longer than max_ms to import and build the app
+    local("python -m benchmarks.startup --max-ms {}".format(max_ms))
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -39,9 +53,7 @@ def heroku():
 
 
 def heroku_test():
-    local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
-    )
+    local("heroku run python -m pytest")
 
 
 def deploy():
@@ -0,0 +1,135 @@
+from collections import Counter
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Venue, Artist, Genre, FacetCount
+
+#----------------------------------------------------------------------------#
+# Listing facets (genre, state, seeking) with maintained counts.
+#----------------------------------------------------------------------------#
+
+FACETS = {
+    'venue': {'model': Venue, 'table': 'venue', 'seeking': 'seeking_talent'},
+    'artist': {'model': Artist, 'table': 'artist', 'seeking': 'seeking_venue'},
+}
+
+
+def facet_values(kind, genres, state, seeking):
+    # the (facet, value) pairs a single venue/artist contributes to the counts
+    values = [('genre', genre) for genre in genres or []]
+    if state:
+        values.append(('state', state))
+    values.append((FACETS[kind]['seeking'], 'true' if seeking else 'false'))
+    return values
+
+
+def entity_facets(kind, entity):
+    if entity is None:
+        return []
+    genres = [genre.name for genre in entity.genres]
+    return facet_values(kind, genres, entity.state, getattr(entity, FACETS[kind]['seeking']))
+
+
+def _upsert(facet_kind, facet, value, delta):
+    dialect = db.engine.dialect.name
+    insert = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}[dialect]
+    statement = insert(FacetCount).values(kind=facet_kind, facet=facet, value=value, count=delta)
+    return statement.on_conflict_do_update(
+        index_elements=['kind', 'facet', 'value'],
+        set_={'count': FacetCount.count + statement.excluded.count}
+    )
+
+
+def adjust_facets(kind, removed=(), added=()):
+    # applies the difference between an entity's old and new facet values in the
+    # caller's transaction, so counts commit (or roll back) with the write itself
+    deltas = Counter(added)
+    deltas.subtract(Counter(removed))
+    for (facet, value), delta in deltas.items():
+        if delta:
+            db.session.execute(_upsert(kind, facet, value, delta))
+    if any(delta < 0 for delta in deltas.values()):
+        db.session.query(FacetCount).filter(FacetCount.kind == kind, FacetCount.count <= 0) \
+            .delete(synchronize_session=False)
+
+
+def rebuild_facets(kind):
+    # full set-based recount, used to repair drift
+    table = FACETS[kind]['table']
+    seeking = FACETS[kind]['seeking']
+    db.session.query(FacetCount).filter(FacetCount.kind == kind).delete(synchronize_session=False)
+    db.session.execute(text(f"""
+        INSERT INTO facet_count (kind, facet, value, count)
+        SELECT :kind, 'genre', genre.name, count(*)
+        FROM {table}_genre JOIN genre ON genre.id = {table}_genre.genre_id GROUP BY genre.name
+        UNION ALL
+        SELECT :kind, 'state', state, count(*) FROM {table} WHERE state IS NOT NULL GROUP BY state
+        UNION ALL
+        SELECT :kind, '{seeking}', CASE WHEN coalesce({seeking}, false) THEN 'true' ELSE 'false' END, count(*)
+        FROM {table} GROUP BY 3
+    """), {'kind': kind})
+
+
+def load_facets(kind):
+    # one primary-key range lookup; returns {facet: [(value, count), ...]}
+    facets = {}
+    rows = db.session.query(FacetCount.facet, FacetCount.value, FacetCount.count) \
+        .filter(FacetCount.kind == kind) \
+        .order_by(FacetCount.facet, FacetCount.count.desc(), FacetCount.value)
+    for facet, value, count in rows:
+        facets.setdefault(facet, []).append((value, count))
+    return facets
+
+
+def parse_filters(kind, args):
+    # listing filters from the query string; unknown keys are ignored
+    filters = {}
+    if args.get('genre'):
+        filters['genre'] = args['genre']
+    if args.get('state'):
+        filters['state'] = args['state']
+    seeking = args.get(FACETS[kind]['seeking'])
+    if seeking in ('true', 'false'):
+        filters['seeking'] = seeking == 'true'
+    return filters
+
+
+def apply_filters(query, kind, filters):
+    model = FACETS[kind]['model']
+    if 'genre' in filters:
+        # EXISTS over the genre link, served by the (genre_id, entity id) index
+        query = query.filter(model.genres.any(Genre.name == filters['genre']))
+    if 'state' in filters:
+        query = query.filter(model.state == filters['state'])
+    if 'seeking' in filters:
+        seeking = getattr(model, FACETS[kind]['seeking'])
+        query = query.filter(seeking.is_(True) if filters['seeking'] else db.or_(seeking.is_(False), seeking.is_(None)))
+    return query
+
+
+def facet_sidebar(kind, args):
+    # facet sections ready for templates/layouts/facets.html: each option links to
+    # the current listing with that value selected (or cleared when already active)
+    seeking = FACETS[kind]['seeking']
+    labels = {'genre': 'Genre', 'state': 'State', seeking: seeking.replace('_', ' ').capitalize()}
+    counts = load_facets(kind)
+    current = {key: value for key, value in args.items() if key in labels}
+
+    sections = []
+    for facet, label in labels.items():
+        options = []
+        for value, count in counts.get(facet, []):
+            active = current.get(facet) == value
+            link_args = dict(current)
+            if active:
+                del link_args[facet]
+            else:
+                link_args[facet] = value
+            options.append({
+                'value': {'true': 'Yes', 'false': 'No'}.get(value, value) if facet == seeking else value,
+                'count': count,
+                'active': active,
+                'args': link_args,
+            })
+        if options:
+            sections.append({'label': label, 'options': options})
+    return sections
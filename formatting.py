@@ -0,0 +1,125 @@
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from flask import current_app, g, has_request_context, request
+
+#----------------------------------------------------------------------------#
+# Date formatting with cached Babel patterns and per-request locale/timezone.
+# babel.dates and dateutil are imported on first use, not at startup.
+#----------------------------------------------------------------------------#
+
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+    'day': "EEEE MMMM d, y",
+    'time': "h:mma",
+}
+
+
+@lru_cache(maxsize=64)
+def compiled_format(format, locale):
+    # the parsed pattern and Locale for a (format, locale) pair, resolved once
+    from babel import Locale
+    from babel.dates import parse_pattern
+    return parse_pattern(FORMATS.get(format, format)), Locale.parse(locale)
+
+
+@lru_cache(maxsize=64)
+def resolve_timezone(name):
+    from babel.dates import get_timezone
+    try:
+        return get_timezone(name)
+    except LookupError:
+        return None
+
+
+@lru_cache(maxsize=8192)
+def _format(value, format, locale, tz_name):
+    # show times cluster on a few hours, so the same values recur on every page
+    pattern, parsed_locale = compiled_format(format, locale)
+    if tz_name != 'UTC' and isinstance(value, datetime):
+        # stored datetimes are naive UTC; dates are already local days
+        value = value.replace(tzinfo=timezone.utc).astimezone(resolve_timezone(tz_name))
+    return pattern.apply(value, parsed_locale)
+
+
+def _as_datetime(value):
+    if isinstance(value, date):
+        return value
+    import dateutil.parser
+    return dateutil.parser.parse(value)
+
+
+def display_settings():
+    # (locale, timezone name) for the current request, or the configured defaults
+    if has_request_context() and 'locale' in g:
+        return g.locale, g.timezone_name
+    return current_app.config['DEFAULT_LOCALE'], current_app.config['DEFAULT_TIMEZONE']
+
+
+def format_datetime(value, format='medium'):
+    if value is None:
+        return ''
+    locale, tz_name = display_settings()
+    return _format(_as_datetime(value), format, locale, tz_name)
+
+
+def format_datetimes(values, format='medium'):
+    # a whole column at once: settings are looked up once and every distinct
+    # value is formatted once
+    locale, tz_name = display_settings()
+    formatted = {}
+    result = []
+    for value in values:
+        if value is None:
+            result.append('')
+            continue
+        if value not in formatted:
+            formatted[value] = _format(_as_datetime(value), format, locale, tz_name)
+        result.append(formatted[value])
+    return result
+
+
+#----------------------------------------------------------------------------#
+# Request settings.
+#----------------------------------------------------------------------------#
+
+def _request_locale(app):
+    supported = app.config['SUPPORTED_LOCALES']
+    requested = request.args.get('locale')
+    if requested in supported:
+        return requested
+    return request.accept_languages.best_match(supported) or app.config['DEFAULT_LOCALE']
+
+
+def _request_timezone(app):
+    # ?tz=Europe/Paris; unknown names fall back to the default
+    requested = request.args.get('tz')
+    if requested and resolve_timezone(requested) is not None:
+        return resolve_timezone(requested).zone
+    return app.config['DEFAULT_TIMEZONE']
+
+
+def init_formatting(app):
+    from babel import Locale, UnknownLocaleError
+    app.config.setdefault('DEFAULT_LOCALE', 'en')
+    app.config.setdefault('DEFAULT_TIMEZONE', 'UTC')
+    app.config.setdefault('SUPPORTED_LOCALES', [app.config['DEFAULT_LOCALE']])
+    for locale in app.config['SUPPORTED_LOCALES']:
+        try:
+            Locale.parse(locale)
+        except (ValueError, UnknownLocaleError):
+            raise RuntimeError(f'Unknown locale in SUPPORTED_LOCALES: {locale}')
+
+    @app.before_request
+    def set_display_settings():
+        g.locale = _request_locale(app)
+        g.timezone_name = _request_timezone(app)
+
+    @app.after_request
+    def vary_on_language(response):
+        if len(app.config['SUPPORTED_LOCALES']) > 1:
+            response.vary.add('Accept-Language')
+        return response
+
+    app.jinja_env.filters['datetime'] = format_datetime
+    app.jinja_env.filters['datetimes'] = format_datetimes
@@ -1,13 +1,18 @@
 from datetime import datetime
 from flask_wtf import FlaskForm as Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, NumberRange, Optional
+
+# minutes a show holds its venue and artist when no duration is given
+DEFAULT_SHOW_DURATION = 120
 
 class ShowForm(Form):
-    artist_id = StringField(
+    # ids are checked against the database in bulk by scheduling.py; imports
+    # may leave them out and give names instead
+    artist_id = IntegerField(
         'artist_id'
     )
-    venue_id = StringField(
+    venue_id = IntegerField(
         'venue_id'
     )
     start_time = DateTimeField(
@@ -15,6 +20,23 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration_minutes = IntegerField(
+        'duration_minutes',
+        validators=[Optional(), NumberRange(min=1, max=24 * 60)],
+        default=DEFAULT_SHOW_DURATION
+    )
+
+    def column_values(self):
+        # Show columns filled in by this form
+        return {
+            "artist_id": self.artist_id.data,
+            "venue_id": self.venue_id.data,
+            "start_time": self.start_time.data,
+        }
+
+    def schedule_entry(self):
+        # column values plus how long the show holds its venue and artist
+        return dict(self.column_values(), duration_minutes=self.duration_minutes.data or DEFAULT_SHOW_DURATION)
 
 class VenueForm(Form):
     name = StringField(
@@ -126,6 +148,21 @@ class VenueForm(Form):
         'seeking_description'
     )
 
+    def column_values(self):
+        # Venue columns filled in by this form; genres are linked with genres.set_genres
+        return {
+            "name": self.name.data,
+            "city": self.city.data,
+            "state": self.state.data,
+            "address": self.address.data,
+            "phone": self.phone.data,
+            "facebook_link": self.facebook_link.data,
+            "image_link": self.image_link.data,
+            "website": self.website_link.data,
+            "seeking_talent": True if self.seeking_talent.data else False,
+            "seeking_discription": self.seeking_description.data,
+        }
+
 
 
 class ArtistForm(Form):
@@ -237,3 +274,16 @@ class ArtistForm(Form):
             'seeking_description'
      )
 
+    def column_values(self):
+        # Artist columns filled in by this form; genres are linked with genres.set_genres
+        return {
+            "name": self.name.data,
+            "city": self.city.data,
+            "state": self.state.data,
+            "phone": self.phone.data,
+            "facebook_link": self.facebook_link.data,
+            "image_link": self.image_link.data,
+            "website": self.website_link.data,
+            "seeking_venue": True if self.seeking_venue.data else False,
+            "seeking_discription": self.seeking_description.data,
+        }
@@ -0,0 +1,82 @@
+from datetime import datetime
+from itertools import islice
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Genre, Venue, Artist, FacetCount, venue_genre, artist_genre
+from cache import invalidate_on_commit, table_tag
+
+#----------------------------------------------------------------------------#
+# Genres of venues and artists.
+#----------------------------------------------------------------------------#
+
+GENRE_LINKS = {
+    'venue': {'model': Venue, 'table': venue_genre, 'key': venue_genre.c.venue_id},
+    'artist': {'model': Artist, 'table': artist_genre, 'key': artist_genre.c.artist_id},
+}
+
+
+def resolve_genres(names):
+    # the Genre rows for the given names, created when missing
+    names = sorted(set(names or []))
+    if not names:
+        return []
+    genres = Genre.query.filter(Genre.name.in_(names)).all()
+    missing = set(names) - {genre.name for genre in genres}
+    if missing:
+        # ON CONFLICT: another request may create the same genre concurrently
+        insert = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}[db.engine.dialect.name]
+        # (a genre nobody uses yet appears on no cached page)
+        db.session.execute(insert(Genre).values([{'name': name} for name in sorted(missing)])
+                           .on_conflict_do_nothing(index_elements=['name'])
+                           .execution_options(cache_tags=[]))
+        genres += Genre.query.filter(Genre.name.in_(missing)).all()
+    return sorted(genres, key=lambda genre: genre.name)
+
+
+def set_genres(entity, names):
+    # replaces the genres of a venue/artist. The changed collection is enough
+    # for its cache tags to be bumped; updated_at records the change as well
+    genres = resolve_genres(names)
+    if genres != list(entity.genres):
+        entity.genres = genres
+        entity.updated_at = datetime.utcnow()
+
+
+def genre_names(kind, ids):
+    # {id: [name, ...]} for a batch of venues/artists, in one indexed join
+    link = GENRE_LINKS[kind]
+    names = {}
+    if not ids:
+        return names
+    rows = db.session.query(link['key'], Genre.name) \
+        .join(Genre, Genre.id == link['table'].c.genre_id) \
+        .filter(link['key'].in_(ids)) \
+        .order_by(link['key'], Genre.name)
+    for entity_id, name in rows:
+        names.setdefault(entity_id, []).append(name)
+    return names
+
+
+def with_genre_names(kind, rows, id_index, batch_size=500):
+    # yields (row, genre names) for a stream of rows, one genre query per batch
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        names = genre_names(kind, [row[id_index] for row in batch])
+        for row in batch:
+            yield row, names.get(row[id_index], [])
+
+
+def rename_genre(old_name, new_name):
+    # one row update instead of rewriting every venue/artist that carries the
+    # genre; returns False when old_name is unknown or new_name is taken
+    genre = Genre.query.filter(Genre.name == old_name).first()
+    if genre is None or Genre.query.filter(Genre.name == new_name).first() is not None:
+        return False
+    genre.name = new_name
+    db.session.query(FacetCount).filter(FacetCount.facet == 'genre', FacetCount.value == old_name) \
+        .update({FacetCount.value: new_name}, synchronize_session=False)
+    # every page listing genre names carries the genre table's tag
+    invalidate_on_commit(db.session, [table_tag('genre')])
+    return True
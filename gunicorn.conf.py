@@ -0,0 +1,27 @@
+import multiprocessing
+import os
+
+#----------------------------------------------------------------------------#
+# Gunicorn settings: gunicorn -c gunicorn.conf.py wsgi:app
+#----------------------------------------------------------------------------#
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = 30
+
+# the app is imported once in the master and the workers are forked from it,
+# so they start in milliseconds and share the imported code pages
+preload_app = True
+
+
+def post_fork(server, worker):
+    # connections must not cross a fork: each worker opens its own pool
+    from models import db
+    from app import autocomplete, replicas
+    from wsgi import app
+    with app.app_context():
+        db.engine.dispose()
+    replicas.dispose(app)
+    # the worker's typeahead indexes are built before its first request
+    autocomplete.start(app)
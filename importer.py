@@ -0,0 +1,200 @@
+import csv
+import json
+from datetime import datetime
+from itertools import islice
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+from models import db, Venue, Artist, Show
+from forms import VenueForm, ArtistForm, ShowForm
+from facets import rebuild_facets
+from genres import resolve_genres
+
+#----------------------------------------------------------------------------#
+# Bulk import of venues, artists and shows from CSV or NDJSON.
+#----------------------------------------------------------------------------#
+
+IMPORTS = {
+    'venues': {'model': Venue, 'form': VenueForm, 'facets': 'venue'},
+    'artists': {'model': Artist, 'form': ArtistForm, 'facets': 'artist'},
+    'shows': {'model': Show, 'form': ShowForm, 'facets': None},
+}
+
+TRUE_VALUES = ('1', 'true', 't', 'yes', 'y', 'on')
+
+
+class Rejected(Exception):
+    pass
+
+
+def read_records(stream, file_format):
+    # yields (line number, record or Rejected) without reading the whole file
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                yield line_number, Rejected(f'invalid JSON: {error}')
+                continue
+            yield line_number, record if isinstance(record, dict) else Rejected('not a JSON object')
+
+
+def form_data(record):
+    # maps a CSV/NDJSON record onto the form fields the web handlers validate
+    data = MultiDict()
+    for key, value in record.items():
+        if value is None or value == '':
+            continue
+        if key == 'genres':
+            genres = value if isinstance(value, list) else value.split(';')
+            for genre in genres:
+                data.add(key, genre.strip())
+        elif key in ('seeking_talent', 'seeking_venue'):
+            if value is True or str(value).strip().lower() in TRUE_VALUES:
+                data.add(key, 'y')
+        elif key == 'start_time':
+            try:
+                data.add(key, datetime.fromisoformat(str(value)).strftime('%Y-%m-%d %H:%M:%S'))
+            except ValueError:
+                data.add(key, str(value))
+        else:
+            data.add(key, str(value))
+    return data
+
+
+def validate(form_class, record):
+    form = form_class(formdata=form_data(record), meta={'csrf': False})
+    if not form.validate():
+        raise Rejected('; '.join(f'{field}: {", ".join(errors)}' for field, errors in form.errors.items()))
+    # shows carry their duration, for their booking
+    values = form.schedule_entry() if form_class is ShowForm else form.column_values()
+    if 'genres' in form:
+        values['genres'] = form.genres.data
+    return values
+
+
+def _lookup(model, column, values):
+    if not values:
+        return {}
+    rows = db.session.query(column, model.id).filter(column.in_(values)).all()
+    found = {}
+    for value, entity_id in rows:
+        # a name shared by several venues/artists cannot be resolved
+        found[value] = None if value in found else entity_id
+    return found
+
+
+def resolve_show_references(chunk):
+    # resolves the artist/venue of every show in the chunk with one query per
+    # model and reference type, by id or by name
+    references = {}
+    for model, key in ((Artist, 'artist'), (Venue, 'venue')):
+        ids = {str(record.get(f'{key}_id')) for _, record, _ in chunk if record.get(f'{key}_id')}
+        names = {record[f'{key}_name'] for _, record, _ in chunk
+                 if not record.get(f'{key}_id') and record.get(f'{key}_name')}
+        known_ids = _lookup(model, model.id, [int(value) for value in ids if value.isdigit()])
+        references[key] = ({str(value): value for value in known_ids}, _lookup(model, model.name, names))
+
+    resolved = []
+    unresolved = []
+    for line_number, record, values in chunk:
+        for key in ('artist', 'venue'):
+            by_id, by_name = references[key]
+            if record.get(f'{key}_id'):
+                entity_id = by_id.get(str(record[f'{key}_id']))
+            else:
+                entity_id = by_name.get(record.get(f'{key}_name'))
+            if entity_id is None:
+                unresolved.append((line_number, record, f'unknown or ambiguous {key} reference'))
+                break
+            values[f'{key}_id'] = entity_id
+        else:
+            resolved.append((line_number, record, values))
+    return resolved, unresolved
+
+
+def _insert(model, rows):
+    if model is Show:
+        # shows are scheduled as the web handlers schedule them: each with its
+        # booking, double bookings rejected, and the counters recounted
+        from scheduling import ScheduleError, schedule_shows
+        try:
+            schedule_shows(rows)
+        except ScheduleError as error:
+            raise Rejected('; '.join(problem['error'] for problem in error.problems))
+        return
+    if 'genres' not in rows[0]:
+        # one multi-row INSERT per chunk (psycopg2 executemany is batched into VALUES lists)
+        db.session.execute(model.__table__.insert(), rows)
+        return
+    # venues/artists need their new ids for the genre links: the ORM batches the
+    # inserts and fetches the ids, and the genres of the whole chunk resolve at once
+    genres = {genre.name: genre for genre in resolve_genres({name for row in rows for name in row['genres']})}
+    db.session.add_all([
+        model(**dict(row, genres=[genres[name] for name in sorted(set(row['genres']))]))
+        for row in rows
+    ])
+    db.session.flush()
+
+
+def import_records(kind, records, chunk_size=1000, on_reject=None):
+    # validates and writes records in chunked transactions; rejected records are
+    # passed to on_reject(line number, record, reason) and the run carries on
+    settings = IMPORTS[kind]
+    model = settings['model']
+    records = iter(records)
+    imported = rejected = 0
+
+    def reject(line_number, record, reason):
+        nonlocal rejected
+        rejected += 1
+        if on_reject is not None:
+            on_reject(line_number, record, str(reason))
+
+    while True:
+        batch = list(islice(records, chunk_size))
+        if not batch:
+            break
+
+        chunk = []
+        for line_number, record in batch:
+            if isinstance(record, Rejected):
+                reject(line_number, None, record)
+                continue
+            try:
+                chunk.append((line_number, record, validate(settings['form'], record)))
+            except Rejected as error:
+                reject(line_number, record, error)
+
+        if kind == 'shows':
+            chunk, unresolved = resolve_show_references(chunk)
+            for line_number, record, reason in unresolved:
+                reject(line_number, record, reason)
+
+        if not chunk:
+            continue
+        try:
+            _insert(model, [values for _, _, values in chunk])
+            db.session.commit()
+            imported += len(chunk)
+        except (SQLAlchemyError, Rejected):
+            # isolating the failing rows: retry the chunk one row per transaction
+            db.session.rollback()
+            for line_number, record, values in chunk:
+                try:
+                    _insert(model, [values])
+                    db.session.commit()
+                    imported += 1
+                except (SQLAlchemyError, Rejected) as error:
+                    db.session.rollback()
+                    reject(line_number, record, getattr(error, 'orig', error))
+
+    if settings['facets'] and imported:
+        rebuild_facets(settings['facets'])
+        db.session.commit()
+    return imported, rejected
@@ -0,0 +1,225 @@
+import ipaddress
+import threading
+import time
+from flask import Response, abort, current_app, g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Per-request SQL/render instrumentation and Prometheus metrics.
+#----------------------------------------------------------------------------#
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'queries', 'sql_seconds', 'render_seconds')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.render_seconds = 0.0
+
+
+def current_metrics():
+    return g.get('request_metrics') if has_request_context() else None
+
+
+class Histogram:
+    # cumulative-bucket histogram in the Prometheus exposition format
+
+    def __init__(self, name, description, labels, buckets):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.setdefault(label_values, [0] * len(self.buckets) + [0, 0.0])
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[position] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                labels = ','.join(f'{key}="{value}"' for key, value in zip(self.labels, label_values))
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-2]}')
+                lines.append(f'{self.name}_count{{{labels}}} {series[-2]}')
+                lines.append(f'{self.name}_sum{{{labels}}} {series[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    # one app's histograms, so every app created by the factory counts its own
+
+    def __init__(self):
+        self.latency = Histogram('fyyur_request_duration_seconds', 'Request latency, including streamed bodies.',
+                                 ('endpoint', 'method', 'status'), LATENCY_BUCKETS)
+        self.sql_time = Histogram('fyyur_request_sql_duration_seconds', 'Time spent in SQL per request.',
+                                  ('endpoint',), LATENCY_BUCKETS)
+        self.render_time = Histogram('fyyur_request_render_duration_seconds', 'Template rendering time per request.',
+                                     ('endpoint',), LATENCY_BUCKETS)
+        self.query_count = Histogram('fyyur_request_queries', 'SQL statements issued per request.',
+                                     ('endpoint',), QUERY_COUNT_BUCKETS)
+
+    def histograms(self):
+        return (self.latency, self.sql_time, self.render_time, self.query_count)
+
+
+class TimedTemplate(Template):
+    # adds template rendering time to the current request's metrics
+
+    def render(self, *args, **kwargs):
+        metrics = current_metrics()
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            if metrics is not None:
+                metrics.render_seconds += time.perf_counter() - started
+
+    def generate(self, *args, **kwargs):
+        # streamed pages render while the body is sent, after the headers are out
+        metrics = current_metrics()
+        chunks = super().generate(*args, **kwargs)
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                if metrics is not None:
+                    metrics.render_seconds += time.perf_counter() - started
+            yield chunk
+
+
+class Instrumentation:
+    # records query count, SQL time, render time and total latency per route
+    # and exposes them on /metrics, to the addresses in METRICS_ALLOWED_NETWORKS.
+    # Responses whose body is not streamed also report them in a Server-Timing
+    # header. Metrics are per process; scrape every worker or run one per host.
+
+    def __init__(self, app=None, db=None):
+        self.db = db
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        self.db = db or self.db
+        app.config.setdefault('METRICS_ALLOWED_NETWORKS', ['127.0.0.0/8', '::1/128'])
+        app.extensions['fyyur_metrics'] = MetricsRegistry()
+        app.jinja_env.template_class = TimedTemplate
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        # engines besides the default one whose pools /metrics reports
+        app.extensions['fyyur_pools'] = []
+        # listening on the Engine class covers the engine Flask-SQLAlchemy
+        # creates lazily from the config, and any other engine added later
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def watch_pool(self, app, engine):
+        # reports the pool of an engine other than the default one on /metrics
+        app.extensions['fyyur_pools'].append(engine)
+
+    #  SQL events
+    #  ----------------------------------------------------------------
+
+    def _before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        started = connection.info['query_started'].pop()
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.sql_seconds += time.perf_counter() - started
+
+    #  Request hooks
+    #  ----------------------------------------------------------------
+
+    def _before_request(self):
+        g.request_metrics = RequestMetrics()
+
+    def _after_request(self, response):
+        metrics = g.get('request_metrics')
+        if metrics is None:
+            return response
+
+        if not response.is_streamed:
+            # a streamed body keeps querying and rendering after the headers
+            # are out, so its timings only reach the histograms
+            elapsed = time.perf_counter() - metrics.started
+            response.headers['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.sql_seconds * 1000:.1f};desc="{metrics.queries} queries"',
+                f'render;dur={metrics.render_seconds * 1000:.1f}',
+                f'app;dur={elapsed * 1000:.1f}',
+            ])
+
+        registry = current_app.extensions['fyyur_metrics']
+        endpoint = request.endpoint or 'unmatched'
+        method = request.method
+        status = str(response.status_code)
+
+        # the histograms are recorded once the response has been sent
+        def record():
+            registry.latency.observe((endpoint, method, status), time.perf_counter() - metrics.started)
+            registry.sql_time.observe((endpoint,), metrics.sql_seconds)
+            registry.render_time.observe((endpoint,), metrics.render_seconds)
+            registry.query_count.observe((endpoint,), metrics.queries)
+
+        response.call_on_close(record)
+        return response
+
+    #  Exposition
+    #  ----------------------------------------------------------------
+
+    def pool_gauges(self):
+        lines = []
+        gauges = [
+            ('fyyur_db_pool_size', 'Connections the pool keeps open.', 'size'),
+            ('fyyur_db_pool_checked_out', 'Connections currently in use.', 'checkedout'),
+            ('fyyur_db_pool_checked_in', 'Idle connections in the pool.', 'checkedin'),
+            ('fyyur_db_pool_overflow', 'Connections opened beyond the pool size.', 'overflow'),
+        ]
+        for name, description, method in gauges:
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} gauge']
+            for engine in [self.db.engine] + current_app.extensions['fyyur_pools']:
+                reading = getattr(engine.pool, method, None)
+                if reading is not None:
+                    lines.append(f'{name}{{engine="{engine.url.host or engine.url.database}"}} {reading()}')
+        return lines
+
+    @staticmethod
+    def _allowed(address):
+        try:
+            address = ipaddress.ip_address(address or '')
+        except ValueError:
+            return False
+        return any(address in ipaddress.ip_network(network)
+                   for network in current_app.config['METRICS_ALLOWED_NETWORKS'])
+
+    def metrics_view(self):
+        # not found for anyone outside METRICS_ALLOWED_NETWORKS
+        if not self._allowed(request.remote_addr):
+            abort(404)
+        lines = []
+        for histogram in current_app.extensions['fyyur_metrics'].histograms():
+            lines += histogram.expose()
+        lines += self.pool_gauges()
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,282 @@
+from datetime import datetime
+from itertools import groupby
+from models import db, Venue, Artist, Genre, Show, venue_genre, artist_genre
+from facets import apply_filters
+from cache import area_tag, entity_tag, table_tag
+
+#----------------------------------------------------------------------------#
+# Venue listing.
+#----------------------------------------------------------------------------#
+
+def venue_listing(filters=None):
+    # one query for the whole listing, with the maintained upcoming show counts,
+    # ordered so that venues of an area are adjacent
+    query = db.session.query(
+        Venue.state,
+        Venue.city,
+        Venue.id,
+        Venue.name,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    )
+    return apply_filters(query, 'venue', filters or {}) \
+        .order_by(Venue.state, Venue.city, Venue.name)
+
+
+def iter_areas(filters=None):
+    # folding the rows into areas in a single pass, yielding each area as soon
+    # as its rows have been read
+    venue_rows = venue_listing(filters).yield_per(500)
+    for (state, city), area_rows in groupby(venue_rows, key=lambda row: (row.state, row.city)):
+        yield {
+            'city': city,
+            'state': state,
+            'venues': [{
+                'id': row.id,
+                'name': row.name,
+                'num_upcoming_shows': row.num_upcoming_shows
+            } for row in area_rows]
+        }
+
+
+#----------------------------------------------------------------------------#
+# Artist listing.
+#----------------------------------------------------------------------------#
+
+def artist_listing(filters=None):
+    query = db.session.query(Artist.id, Artist.name, Artist.upcoming_shows_count.label('num_upcoming_shows'))
+    return apply_filters(query, 'artist', filters or {}).order_by(Artist.name)
+
+
+#----------------------------------------------------------------------------#
+# Detail page loaders.
+#----------------------------------------------------------------------------#
+
+def split_shows(rows, now):
+    # splitting one ordered result into past and upcoming shows against a single "now"
+    past_shows = []
+    upcoming_shows = []
+    for row in rows:
+        if row.start_time > now:
+            upcoming_shows.append(row._asdict())
+        else:
+            past_shows.append(row._asdict())
+    return past_shows, upcoming_shows
+
+
+def venue_shows(venue_id):
+    # only the columns the venue page renders, in one joined query
+    return db.session.query(
+        Show.start_time,
+        Artist.id.label('artist_id'),
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+    ).join(Artist, Artist.id == Show.artist_id) \
+        .filter(Show.venue_id == venue_id) \
+        .order_by(Show.start_time)
+
+
+def artist_shows(artist_id):
+    # only the columns the artist page renders, in one joined query
+    return db.session.query(
+        Show.start_time,
+        Venue.id.label('venue_id'),
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link')
+    ).join(Venue, Venue.id == Show.venue_id) \
+        .filter(Show.artist_id == artist_id) \
+        .order_by(Show.start_time)
+
+
+def venue_data(venue, genres, past_shows, upcoming_shows):
+    # the venue page's data from a Venue (or a venue row) and its shows
+    return {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": genres,
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_discription,
+        "image_link": venue.image_link,
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows),
+    }
+
+
+def artist_data(artist, genres, past_shows, upcoming_shows):
+    # the artist page's data from an Artist (or an artist row) and its shows
+    return {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": genres,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_discription,
+        "image_link": artist.image_link,
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows),
+    }
+
+
+def load_venue(venue_id, now=None):
+    venue = db.session.query(Venue).get(venue_id)
+    if venue is None:
+        return None
+
+    past_shows, upcoming_shows = split_shows(venue_shows(venue_id).all(), now or datetime.utcnow())
+    return venue_data(venue, [genre.name for genre in venue.genres], past_shows, upcoming_shows)
+
+
+def load_artist(artist_id, now=None):
+    artist = db.session.query(Artist).get(artist_id)
+    if artist is None:
+        return None
+
+    past_shows, upcoming_shows = split_shows(artist_shows(artist_id).all(), now or datetime.utcnow())
+    return artist_data(artist, [genre.name for genre in artist.genres], past_shows, upcoming_shows)
+
+
+def detail_statements(kind, entity_id, now):
+    # the independent queries of a detail page as Core statements, for
+    # running them concurrently: (entity row, genre names, past shows, upcoming shows)
+    model, link, shows = (Venue, venue_genre, venue_shows) if kind == 'venue' else (Artist, artist_genre, artist_shows)
+    link_column = link.c[f'{kind}_id']
+    shows_query = shows(entity_id)
+    return (
+        db.select(model.__table__).where(model.id == entity_id),
+        db.select(Genre.name).join(link, link.c.genre_id == Genre.id).where(link_column == entity_id).order_by(Genre.name),
+        shows_query.filter(Show.start_time <= now).statement,
+        shows_query.filter(Show.start_time > now).statement,
+    )
+
+
+#----------------------------------------------------------------------------#
+# Show listing.
+#----------------------------------------------------------------------------#
+
+def encode_cursor(start_time, show_id):
+    return f'{start_time.isoformat()},{show_id}'
+
+
+def decode_cursor(cursor):
+    # returns the (start_time, id) key a page starts after, or None when the cursor is invalid
+    try:
+        start_time, show_id = cursor.rsplit(',', 1)
+        return datetime.fromisoformat(start_time), int(show_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+SHOW_LISTING_COLUMNS = {
+    'id': Show.id,
+    'start_time': Show.start_time,
+    'venue_id': Show.venue_id,
+    'venue_name': Venue.name.label('venue_name'),
+    'artist_id': Show.artist_id,
+    'artist_name': Artist.name.label('artist_name'),
+    'artist_image_link': Artist.image_link.label('artist_image_link'),
+}
+
+
+def shows_listing(after=None, columns=None):
+    # keyset pagination on (start_time, id): every page is one indexed range scan,
+    # so its cost does not depend on how deep into the listing it is
+    query = db.session.query(*(columns or SHOW_LISTING_COLUMNS.values())) \
+        .select_from(Show) \
+        .join(Venue, Venue.id == Show.venue_id) \
+        .join(Artist, Artist.id == Show.artist_id)
+
+    if after is not None:
+        query = query.filter(db.tuple_(Show.start_time, Show.id) > db.tuple_(*after))
+    return query.order_by(Show.start_time, Show.id)
+
+
+def shows_page(after=None, per_page=30):
+    rows = shows_listing(after).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1].start_time, rows[-1].id)
+    return [row._asdict() for row in rows], next_cursor
+
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def _escape_like(term):
+    # escaping LIKE wildcards (with "/", as SQLAlchemy's autoescape does) so user input is matched literally
+    return term.replace('/', '//').replace('%', '/%').replace('_', '/_')
+
+
+def _like_pattern(term):
+    return f'%{_escape_like(term)}%'
+
+
+def search_query(model, search_term):
+    # partial, case-insensitive matching on the name, plus "city, state" matching.
+    # Both predicates are served by the pg_trgm GIN indexes on venue/artist.
+    search_term = search_term.strip()
+    criteria = [model.name.ilike(_like_pattern(search_term), escape='/')]
+
+    if ',' in search_term:
+        city, state = (part.strip() for part in search_term.rsplit(',', 1))
+        criteria.append(db.and_(model.city.ilike(_escape_like(city), escape='/'),
+                                model.state.ilike(_escape_like(state), escape='/')))
+
+    query = db.session.query(model.id, model.name).filter(db.or_(*criteria))
+
+    if db.engine.dialect.name == 'postgresql':
+        return query.order_by(db.func.similarity(model.name, search_term).desc(), model.name)
+    return query.order_by(model.name)
+
+
+def search(model, search_term, limit=50):
+    return search_query(model, search_term).limit(limit).all()
+
+
+#----------------------------------------------------------------------------#
+# Cache tags of the page data above (see cache.py). Called with None before
+# the data is read, they stand in for the tags the data will add.
+#----------------------------------------------------------------------------#
+
+def venue_listing_tags(areas):
+    # every venue write bumps 'venues' as well as the areas
+    return ['venues', table_tag('venue'), table_tag('genre'),
+            *(area_tag(area['state'], area['city']) for area in areas or ())]
+
+
+def artist_listing_tags(artists):
+    return ['artists', table_tag('artist'), table_tag('genre')]
+
+
+def detail_tags(kind, entity_id, data):
+    # the page also shows the names and images of the other side of its shows
+    other = 'artist' if kind == 'venue' else 'venue'
+    tags = [entity_tag(kind, entity_id), table_tag(kind), table_tag(other), table_tag('show'), table_tag('genre')]
+    if data is None:
+        # any of the other side until the shows are known
+        return tags + [f'{other}s']
+    return tags + [*{entity_tag(other, show[f'{other}_id']) for show in data['past_shows'] + data['upcoming_shows']}]
+
+
+def next_show_start(data):
+    # detail pages split shows on "now", so they expire when the next one starts
+    return data['upcoming_shows'][0]['start_time'] if data and data['upcoming_shows'] else None
+
+
+def shows_page_tags(page):
+    return ['shows', 'venues', 'artists', table_tag('show'), table_tag('venue'), table_tag('artist')]
@@ -0,0 +1,76 @@
+"""genre, venue_genre and artist_genre tables replacing the genres arrays
+
+Revision ID: 3d7a91c4b6e2
+Revises: f52c0d9a7b81
+Create Date: 2022-07-23 10:12:48.507316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '3d7a91c4b6e2'
+down_revision = 'f52c0d9a7b81'
+branch_labels = None
+depends_on = None
+
+TABLES = ['venue', 'artist']
+
+
+def upgrade():
+    op.create_table('genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table in TABLES:
+        op.create_table(f'{table}_genre',
+        sa.Column(f'{table}_id', sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([f'{table}_id'], [f'{table}.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(f'{table}_id', 'genre_id')
+        )
+        op.create_index(f'ix_{table}_genre_genre_id_{table}_id', f'{table}_genre', ['genre_id', f'{table}_id'], unique=False)
+
+    # existing arrays become genre rows and links
+    op.execute("""
+        INSERT INTO genre (name)
+        SELECT DISTINCT genre FROM (
+            SELECT unnest(genres) AS genre FROM venue
+            UNION
+            SELECT unnest(genres) AS genre FROM artist
+        ) AS names
+        WHERE genre IS NOT NULL AND genre <> ''
+        ORDER BY genre
+    """)
+    for table in TABLES:
+        op.execute(f"""
+            INSERT INTO {table}_genre ({table}_id, genre_id)
+            SELECT DISTINCT {table}.id, genre.id
+            FROM {table}, unnest({table}.genres) AS linked(genre_name)
+            JOIN genre ON genre.name = linked.genre_name
+        """)
+        op.drop_index(f'ix_{table}_genres', table_name=table)
+        op.drop_column(table, 'genres')
+
+
+def downgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('genres', postgresql.ARRAY(sa.String()), server_default='{}', nullable=False))
+        op.execute(f"""
+            UPDATE {table} SET genres = linked.names
+            FROM (
+                SELECT {table}_genre.{table}_id AS id, array_agg(genre.name ORDER BY genre.name) AS names
+                FROM {table}_genre JOIN genre ON genre.id = {table}_genre.genre_id
+                GROUP BY {table}_genre.{table}_id
+            ) AS linked
+            WHERE {table}.id = linked.id
+        """)
+        op.alter_column(table, 'genres', server_default=None)
+        op.create_index(f'ix_{table}_genres', table, ['genres'], unique=False, postgresql_using='gin')
+        op.drop_index(f'ix_{table}_genre_genre_id_{table}_id', table_name=f'{table}_genre')
+        op.drop_table(f'{table}_genre')
+    op.drop_table('genre')
@@ -0,0 +1,29 @@
+"""cache tag versions shared by all workers
+
+Revision ID: 5e8c3a1f9d27
+Revises: d47e1a9c2b58
+Create Date: 2022-08-20 10:12:48.305117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8c3a1f9d27'
+down_revision = 'd47e1a9c2b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cache_version',
+    sa.Column('tag', sa.String(length=200), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('bumped_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('tag')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_version')
@@ -0,0 +1,31 @@
+"""index show on (start_time, id)
+
+Revision ID: 7c1e4b9d2f60
+Revises: 2589e9ae18da
+Create Date: 2022-06-20 10:12:44.318204
+
+The index is built CONCURRENTLY, in an autocommit block, so the revision can
+be applied to a live database without blocking writes to show. If the build
+fails it leaves an INVALID index behind: drop it and run the upgrade again.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e4b9d2f60'
+down_revision = '2589e9ae18da'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Backs the (start_time, id) keyset pagination of /shows
+    with op.get_context().autocommit_block():
+        op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_show_start_time_id', table_name='show', postgresql_concurrently=True)
@@ -0,0 +1,44 @@
+"""upcoming/past show counters and next_show_at on venue and artist
+
+Revision ID: 8b2e6f0d4c19
+Revises: 3d7a91c4b6e2
+Create Date: 2022-07-30 09:26:14.331870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e6f0d4c19'
+down_revision = '3d7a91c4b6e2'
+branch_labels = None
+depends_on = None
+
+TABLES = ['venue', 'artist']
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('next_show_at', sa.DateTime(), nullable=True))
+        # initial counts; from here on counters.py keeps them current
+        op.execute(f"""
+            UPDATE {table} SET
+                upcoming_shows_count = (SELECT count(*) FROM show WHERE show.{table}_id = {table}.id AND show.start_time > timezone('utc', now())),
+                past_shows_count = (SELECT count(*) FROM show WHERE show.{table}_id = {table}.id AND show.start_time <= timezone('utc', now())),
+                next_show_at = (SELECT min(start_time) FROM show WHERE show.{table}_id = {table}.id AND show.start_time > timezone('utc', now()))
+        """)
+    # the roll job looks up venues/artists whose next show has started
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.create_index(f'ix_{table}_next_show_at', table, ['next_show_at'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_next_show_at', table_name=table)
+        op.drop_column(table, 'next_show_at')
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,46 @@
+"""trigram indexes for venue and artist search
+
+Revision ID: a3f58d6e1b27
+Revises: 7c1e4b9d2f60
+Create Date: 2022-06-24 16:40:08.562913
+
+The indexes are built CONCURRENTLY, in an autocommit block, so the revision
+can be applied to a live database without blocking writes to venue and
+artist. If a build fails it leaves an INVALID index behind: drop it and run
+the upgrade again.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f58d6e1b27'
+down_revision = '7c1e4b9d2f60'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = {
+    'venue': ['name', 'city', 'state'],
+    'artist': ['name', 'city', 'state'],
+}
+
+
+def upgrade():
+    # pg_trgm lets GIN indexes serve ILIKE '%term%' and similarity() ranking
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # the block commits the extension before the first build
+    with op.get_context().autocommit_block():
+        for table, columns in SEARCH_COLUMNS.items():
+            for column in columns:
+                op.create_index(
+                    f'ix_{table}_{column}_trgm', table, [column], unique=False, postgresql_concurrently=True,
+                    postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'}
+                )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table, columns in SEARCH_COLUMNS.items():
+            for column in columns:
+                op.drop_index(f'ix_{table}_{column}_trgm', table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,94 @@
+"""partition show by month of start_time
+
+Revision ID: b6d04e2a7f35
+Revises: 8b2e6f0d4c19
+Create Date: 2022-08-06 15:41:09.662204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d04e2a7f35'
+down_revision = '8b2e6f0d4c19'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_show_start_time_id', ['start_time', 'id']),
+    ('ix_show_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_show_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_show_updated_at', ['updated_at']),
+]
+
+# monthly partitions created up front past the current month; `flask fyyur
+# partitions` keeps creating them ahead from here on
+MONTHS_AHEAD = 3
+
+
+def _move_aside():
+    # the old heap keeps its rows until they are copied; its index and
+    # constraint names are freed for the new table
+    op.rename_table('show', 'show_old')
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='show_old')
+    op.execute('ALTER TABLE show_old RENAME CONSTRAINT show_pkey TO show_old_pkey')
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY NONE')
+
+
+def _finish(columns):
+    op.execute(f'INSERT INTO show ({columns}) SELECT {columns} FROM show_old')
+    op.drop_table('show_old')
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY show.id')
+    for name, columns in INDEXES:
+        op.create_index(name, 'show', columns, unique=False)
+
+
+def upgrade():
+    _move_aside()
+    # the partition key has to be part of the primary key
+    op.execute("""
+        CREATE TABLE show (
+            id integer NOT NULL DEFAULT nextval('show_id_seq'),
+            artist_id integer NOT NULL REFERENCES artist (id),
+            venue_id integer NOT NULL REFERENCES venue (id),
+            start_time timestamp without time zone NOT NULL,
+            updated_at timestamp without time zone NOT NULL DEFAULT timezone('utc', now()),
+            PRIMARY KEY (id, start_time)
+        ) PARTITION BY RANGE (start_time)
+    """)
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month timestamp;
+        BEGIN
+            FOR month IN SELECT generate_series(
+                date_trunc('month', coalesce((SELECT min(start_time) FROM show_old), timezone('utc', now()))),
+                date_trunc('month', timezone('utc', now())) + interval '{MONTHS_AHEAD} months',
+                interval '1 month'
+            ) LOOP
+                EXECUTE format('CREATE TABLE %I PARTITION OF show FOR VALUES FROM (%L) TO (%L)',
+                    'show_y' || to_char(month, 'YYYY"m"MM'), month, month + interval '1 month');
+            END LOOP;
+        END $$
+    """)
+    # shows booked further ahead than the partitions land here until theirs is created
+    op.execute('CREATE TABLE show_default PARTITION OF show DEFAULT')
+    _finish('id, artist_id, venue_id, start_time, updated_at')
+
+
+def downgrade():
+    _move_aside()
+    op.create_table('show',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('show_id_seq')"), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # dropping the partitioned parent drops its partitions with it
+    _finish('id, artist_id, venue_id, start_time, updated_at')
@@ -0,0 +1,44 @@
+"""performance indexes for show, venue and artist
+
+Revision ID: c84d2a0f5e13
+Revises: a3f58d6e1b27
+Create Date: 2022-07-02 09:31:57.104728
+
+The indexes are built CONCURRENTLY so the revision can be applied to a live
+database without blocking writes. CREATE INDEX CONCURRENTLY cannot run inside
+a transaction, hence the autocommit block. If a build fails it leaves an
+INVALID index behind: drop it and run the upgrade again.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c84d2a0f5e13'
+down_revision = 'a3f58d6e1b27'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    # detail pages: a venue's/artist's shows ordered by start time
+    ('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], {}),
+    ('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], {}),
+    # /venues grouping by area
+    ('ix_venue_state_city', 'venue', ['state', 'city'], {}),
+    # genre containment (genres @> ARRAY[...])
+    ('ix_venue_genres', 'venue', ['genres'], {'postgresql_using': 'gin'}),
+    ('ix_artist_genres', 'artist', ['genres'], {'postgresql_using': 'gin'}),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True, **options)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,51 @@
+"""booking table with exclusion constraints against double bookings
+
+Revision ID: d47e1a9c2b58
+Revises: b6d04e2a7f35
+Create Date: 2022-08-13 11:05:37.418256
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd47e1a9c2b58'
+down_revision = 'b6d04e2a7f35'
+branch_labels = None
+depends_on = None
+
+# duration given to the shows booked before durations were recorded
+DEFAULT_DURATION = '120 minutes'
+
+
+def upgrade():
+    # btree_gist lets integer equality share a GiST index with range overlap
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.create_table('booking',
+    sa.Column('show_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('starts_at', sa.DateTime(), nullable=False),
+    sa.Column('ends_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('show_id')
+    )
+    op.execute('ALTER TABLE booking ADD CONSTRAINT booking_venue_overlap '
+               'EXCLUDE USING gist (venue_id WITH =, tsrange(starts_at, ends_at) WITH &&)')
+    op.execute('ALTER TABLE booking ADD CONSTRAINT booking_artist_overlap '
+               'EXCLUDE USING gist (artist_id WITH =, tsrange(starts_at, ends_at) WITH &&)')
+    # upcoming shows get a booking; of shows already double booked, the earliest
+    # listed keeps the slot and the others stay unguarded
+    op.execute(f"""
+        INSERT INTO booking (show_id, venue_id, artist_id, starts_at, ends_at)
+        SELECT id, venue_id, artist_id, start_time, start_time + interval '{DEFAULT_DURATION}'
+        FROM show WHERE start_time > timezone('utc', now())
+        ORDER BY id
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade():
+    op.drop_table('booking')
@@ -0,0 +1,43 @@
+"""facet_count table for genre/state/seeking listing facets
+
+Revision ID: e19b7f3c8a42
+Revises: c84d2a0f5e13
+Create Date: 2022-07-09 14:05:12.880391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e19b7f3c8a42'
+down_revision = 'c84d2a0f5e13'
+branch_labels = None
+depends_on = None
+
+FACET_SOURCES = [('venue', 'seeking_talent'), ('artist', 'seeking_venue')]
+
+
+def upgrade():
+    op.create_table('facet_count',
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('facet', sa.String(length=40), nullable=False),
+    sa.Column('value', sa.String(length=120), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('kind', 'facet', 'value')
+    )
+    # initial counts; from here on facets.adjust_facets keeps them current
+    for table, seeking in FACET_SOURCES:
+        op.execute(f"""
+            INSERT INTO facet_count (kind, facet, value, count)
+            SELECT '{table}', 'genre', genre, count(*) FROM {table}, unnest({table}.genres) AS genre GROUP BY genre
+            UNION ALL
+            SELECT '{table}', 'state', state, count(*) FROM {table} WHERE state IS NOT NULL GROUP BY state
+            UNION ALL
+            SELECT '{table}', '{seeking}', CASE WHEN coalesce({seeking}, false) THEN 'true' ELSE 'false' END, count(*)
+            FROM {table} GROUP BY 3
+        """)
+
+
+def downgrade():
+    op.drop_table('facet_count')
@@ -0,0 +1,35 @@
+"""updated_at on venue, artist and show for conditional GET
+
+Revision ID: f52c0d9a7b81
+Revises: e19b7f3c8a42
+Create Date: 2022-07-16 11:47:23.016554
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f52c0d9a7b81'
+down_revision = 'e19b7f3c8a42'
+branch_labels = None
+depends_on = None
+
+TABLES = ['venue', 'artist', 'show']
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False))
+    # max(updated_at) is read on every conditional GET, so it has to be an index lookup
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.drop_index(f'ix_{table}_updated_at', table_name=table, postgresql_concurrently=True)
+    for table in TABLES:
+        op.drop_column(table, 'updated_at')
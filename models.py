@@ -1,8 +1,42 @@
-from flask_sqlalchemy import SQLAlchemy
-db = SQLAlchemy()
+from datetime import datetime
+from replicas import RoutingSQLAlchemy
+# reads of the views routed to replicas go there; see replicas.py
+db = RoutingSQLAlchemy()
+
+# genre links; the primary keys serve "genres of a venue/artist", the reversed
+# indexes serve "venues/artists with a genre"
+venue_genre = db.Table('venue_genre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_venue_genre_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genre = db.Table('artist_genre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_artist_genre_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+class Genre(db.Model):
+  __tablename__ = 'genre'
+
+  id = db.Column(db.Integer, primary_key=True)
+  name = db.Column(db.String(120), nullable=False, unique=True)
+
+  def __repr__(self):
+       return f'<Genre ID: {self.id} name: {self.name}>'
+
 
 class Venue(db.Model):
     __tablename__ = 'venue'
+    __table_args__ = (
+        db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venue_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_venue_state_trgm', 'state', postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'}),
+        db.Index('ix_venue_state_city', 'state', 'city'),
+        db.Index('ix_venue_updated_at', 'updated_at'),
+        db.Index('ix_venue_next_show_at', 'next_show_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -12,10 +46,15 @@ class Venue(db.Model):
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String()), nullable=False)
+    genres = db.relationship('Genre', secondary=venue_genre, order_by='Genre.name')
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_discription = db.Column(db.String(120))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # maintained by counters.py, so listings never count shows
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime)
     show = db.relationship('Show', backref='venue', lazy=True)
     # implement any missing fields, as a database migration using Flask-Migrate
     def __repr__(self):
@@ -24,18 +63,30 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artist'
+    __table_args__ = (
+        db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artist_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_artist_state_trgm', 'state', postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'}),
+        db.Index('ix_artist_updated_at', 'updated_at'),
+        db.Index('ix_artist_next_show_at', 'next_show_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String()), nullable=False)
+    genres = db.relationship('Genre', secondary=artist_genre, order_by='Genre.name')
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_discription = db.Column(db.String(120))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # maintained by counters.py, so listings never count shows
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime)
     show = db.relationship('Show', backref='artist', lazy=True)
 
     def __repr__(self):
@@ -43,13 +94,67 @@ class Artist(db.Model):
     
     
 class Show(db.Model):
+  # on PostgreSQL the table is range-partitioned by month of start_time, with
+  # (id, start_time) as its primary key; id alone stays unique (see partitions.py)
   __tablename__ = 'show'
+  __table_args__ = (
+    db.Index('ix_show_start_time_id', 'start_time', 'id'),
+    db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_show_updated_at', 'updated_at'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
   venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
   start_time = db.Column(db.DateTime, nullable=False)
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+  # no foreign key from booking: it would stop partitions from being detached
+  booking = db.relationship('Booking', primaryjoin='Show.id == foreign(Booking.show_id)',
+    uselist=False, cascade='all, delete-orphan')
 
   def __repr__(self):
        return f'<Artist ID: {self.id} artist_id: {self.artist_id} venue_id: {self.venue_id} start_date: {self.start_time}>'
-    
\ No newline at end of file
+
+
+class Booking(db.Model):
+  # the time slot a show holds at its venue and for its artist. On PostgreSQL,
+  # exclusion constraints over tsrange(starts_at, ends_at) reject overlapping
+  # bookings (migration d47e1a9c2b58); they live here rather than on the
+  # partitioned show table, which cannot carry them
+  __tablename__ = 'booking'
+
+  show_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+  venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), nullable=False)
+  artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), nullable=False)
+  starts_at = db.Column(db.DateTime, nullable=False)
+  ends_at = db.Column(db.DateTime, nullable=False)
+
+  def __repr__(self):
+       return f'<Booking show_id: {self.show_id} venue_id: {self.venue_id} artist_id: {self.artist_id} starts_at: {self.starts_at} ends_at: {self.ends_at}>'
+    
+
+class FacetCount(db.Model):
+  # precomputed listing facet counts, maintained by facets.adjust_facets
+  __tablename__ = 'facet_count'
+
+  kind = db.Column(db.String(20), primary_key=True)
+  facet = db.Column(db.String(40), primary_key=True)
+  value = db.Column(db.String(120), primary_key=True)
+  count = db.Column(db.Integer, nullable=False, default=0)
+
+  def __repr__(self):
+       return f'<FacetCount kind: {self.kind} facet: {self.facet} value: {self.value} count: {self.count}>'
+
+
+class CacheVersion(db.Model):
+  # version of a page cache tag, bumped in the transactions that write what
+  # the tag covers (cache.bump_versions)
+  __tablename__ = 'cache_version'
+
+  tag = db.Column(db.String(200), primary_key=True)
+  version = db.Column(db.BigInteger, nullable=False, default=0)
+  bumped_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+  def __repr__(self):
+       return f'<CacheVersion tag: {self.tag} version: {self.version}>'
@@ -0,0 +1,111 @@
+import re
+from datetime import datetime
+from sqlalchemy import text
+from models import db, Venue, Artist, Show
+from counters import refresh_counters
+from cache import invalidate_on_commit, table_tag
+
+#----------------------------------------------------------------------------#
+# Monthly partitions of the show table (PostgreSQL).
+#----------------------------------------------------------------------------#
+
+PARENT = 'show'
+DEFAULT_PARTITION = 'show_default'
+PARTITION_NAME = re.compile(r'^show_y(\d{4})m(\d{2})$')
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'show_y{month.year}m{month.month:02d}'
+
+
+def attached_partitions():
+    # {month: partition name} for the monthly partitions attached to show
+    rows = db.session.execute(text("""
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :parent
+    """), {'parent': PARENT})
+    partitions = {}
+    for name, in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[datetime(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def create_partition(month):
+    # shows already booked for the month sit in the default partition; they are
+    # moved into the new table before it is attached, in one transaction
+    name = partition_name(month)
+    bounds = {'lower': month, 'upper': add_months(month, 1)}
+    db.session.execute(text(f'CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    db.session.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE start_time >= :lower AND start_time < :upper RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), bounds)
+    db.session.execute(text(
+        f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM ('{bounds['lower']}') TO ('{bounds['upper']}')"
+    ))
+    return name
+
+
+def ensure_partitions(ahead=3, now=None):
+    # creates the partitions of the current month and the next `ahead` months
+    current = month_start(now or datetime.utcnow())
+    existing = attached_partitions()
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            created.append(create_partition(month))
+    return created
+
+
+def archive_partitions(retain=24, now=None, schema='archive', drop=False):
+    # detaches the partitions that ended more than `retain` months ago and moves
+    # them to `schema` (or drops them); their shows leave the app, so the past
+    # counters of the venues/artists concerned are recounted
+    cutoff = add_months(month_start(now or datetime.utcnow()), -retain)
+    archived = []
+    for month, name in sorted(attached_partitions().items()):
+        if add_months(month, 1) > cutoff:
+            continue
+        affected = {
+            kind: [entity_id for entity_id, in db.session.execute(text(f'SELECT DISTINCT {kind}_id FROM {name}'))]
+            for kind in ('venue', 'artist')
+        }
+        # their bookings only guard against overlaps with shows still to come
+        db.session.execute(text(f'DELETE FROM booking WHERE show_id IN (SELECT id FROM {name})'))
+        db.session.execute(text(f'ALTER TABLE {PARENT} DETACH PARTITION {name}'))
+        if drop:
+            db.session.execute(text(f'DROP TABLE {name}'))
+        else:
+            db.session.execute(text(f'CREATE SCHEMA IF NOT EXISTS {schema}'))
+            db.session.execute(text(f'ALTER TABLE {name} SET SCHEMA {schema}'))
+        # the pages of these venues/artists no longer list the archived shows
+        invalidate_on_commit(db.session, [table_tag(PARENT)])
+        refresh_counters('venue', Venue.id.in_(affected['venue']))
+        refresh_counters('artist', Artist.id.in_(affected['artist']))
+        archived.append(name)
+    return archived
+
+
+def upcoming_partitions_scanned(now=None):
+    # partitions the planner reads for an "upcoming shows" predicate; pruning
+    # should leave the current and future months (and the default) only
+    query = db.session.query(db.func.count(Show.id)).filter(Show.start_time > (now or datetime.utcnow()))
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    plan = db.session.connection().exec_driver_sql(f'EXPLAIN {compiled}', compiled.params)
+    return sorted({name for row in plan for name in re.findall(r'\bshow_(?:y\d{4}m\d{2}|default)\b', row[0])})
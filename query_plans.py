@@ -0,0 +1,70 @@
+import re
+from datetime import datetime
+from sqlalchemy import text
+
+#----------------------------------------------------------------------------#
+# EXPLAIN checks that the app's queries are served by their indexes (PostgreSQL).
+#----------------------------------------------------------------------------#
+
+# "Index Scan using ix on t", "Index Only Scan using ix on t", "Bitmap Index Scan on ix"
+PLAN_INDEX = re.compile(r'(?:Index (?:Only )?Scan(?: Backward)? using|Bitmap Index Scan on) (\S+)')
+
+# every index of the plan with its ancestors: on a partitioned table the plan
+# names each partition's own index (show_y2022m08_venue_id_start_time_idx),
+# which pg_inherits links to the index declared on the parent
+INDEX_ANCESTORS = text("""
+    WITH RECURSIVE ancestors (oid) AS (
+        SELECT oid FROM pg_class WHERE relkind IN ('i', 'I') AND relname = ANY(:names)
+        UNION
+        SELECT pg_inherits.inhparent FROM ancestors JOIN pg_inherits ON pg_inherits.inhrelid = ancestors.oid
+    )
+    SELECT pg_class.relname FROM ancestors JOIN pg_class ON pg_class.oid = ancestors.oid
+""")
+
+
+def index_checks():
+    # (description, query as issued by the app, indexes any of which should serve it)
+    from loaders import venue_listing, artist_listing, venue_shows, artist_shows, shows_listing, search_query
+    from models import Venue, Artist
+    from show_calendar import calendar_query
+
+    return [
+        ('venue detail shows', venue_shows(1), ['ix_show_venue_id_start_time']),
+        ('artist detail shows', artist_shows(1), ['ix_show_artist_id_start_time']),
+        ('venue listing', venue_listing(), ['ix_venue_state_city']),
+        ('venue genre filter', venue_listing({'genre': 'Jazz'}), ['ix_venue_genre_genre_id_venue_id', 'venue_genre_pkey']),
+        ('artist genre filter', artist_listing({'genre': 'Jazz'}), ['ix_artist_genre_genre_id_artist_id', 'artist_genre_pkey']),
+        ('show listing page', shows_listing().limit(30), ['ix_show_start_time_id']),
+        ('show calendar week', calendar_query(datetime(2022, 8, 1), datetime(2022, 8, 8), {}), ['ix_show_start_time_id']),
+        ('venue search', search_query(Venue, 'hall').limit(50), ['ix_venue_name_trgm']),
+        ('artist search', search_query(Artist, 'band').limit(50), ['ix_artist_name_trgm']),
+    ]
+
+
+def explain(connection, query):
+    # the plan of a query, with sequential scans disabled: small development
+    # tables are cheaper to scan, and the point is whether an index can serve it
+    with connection.begin() as transaction:
+        connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        compiled = query.statement.compile(dialect=connection.dialect)
+        plan = '\n'.join(row[0] for row in connection.exec_driver_sql(f'EXPLAIN {compiled}', compiled.params))
+        transaction.rollback()
+    return plan
+
+
+def plan_indexes(connection, plan):
+    # the indexes a plan scans, and the parent indexes of the partition indexes among them
+    names = sorted(set(PLAN_INDEX.findall(plan)))
+    if not names:
+        return set()
+    return set(names) | {name for name, in connection.execute(INDEX_ANCESTORS, {'names': names})}
+
+
+def check_indexes(connection):
+    # [(description, expected indexes, indexes used of them, plan)]
+    results = []
+    for description, query, expected in index_checks():
+        plan = explain(connection, query)
+        used = plan_indexes(connection, plan)
+        results.append((description, expected, [index for index in expected if index in used], plan))
+    return results
@@ -0,0 +1,39 @@
+import os
+from flask import Response, current_app, render_template, session, stream_with_context
+from jinja2 import FileSystemBytecodeCache
+
+#----------------------------------------------------------------------------#
+# Template rendering.
+#----------------------------------------------------------------------------#
+
+def init_bytecode_cache(app):
+    # compiled templates are shared through the filesystem, so a fresh worker
+    # loads bytecode instead of compiling templates/ again at cold start
+    cache_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+
+def warm_templates(app):
+    # compiles every template once so the bytecode cache is filled ahead of traffic
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
+
+
+def stream_page(template_name, **context):
+    # like render_template, but the page is sent in chunks as it renders, so
+    # the first bytes go out while rows are still coming from the database.
+    # Context values may be generators or queries; they are consumed lazily.
+    if session.get('_flashes'):
+        # the session cookie goes out before a streamed body is rendered, so
+        # the flashes the template pops would never leave the session
+        return render_template(template_name, **context)
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    template = app.jinja_env.get_or_select_template(template_name)
+    stream = template.stream(context)
+    stream.enable_buffering(app.config.get('TEMPLATE_STREAM_BUFFER', 20))
+    return Response(stream_with_context(stream), mimetype='text/html')
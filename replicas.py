@@ -0,0 +1,167 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, orm, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+
+#----------------------------------------------------------------------------#
+# Read replicas for the read-only views, with the primary for everything else.
+#----------------------------------------------------------------------------#
+
+# session cookie key: until this time, the client's reads stay on the primary
+PRIMARY_UNTIL = 'primary_until'
+
+# seconds behind the primary; 0 when every WAL record received has been replayed
+REPLICA_LAG = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class RoutingSession(SignallingSession):
+    # the statements of a replica-routed request go to g.replica, except
+    # flushes and INSERT/UPDATE/DELETE statements, which always go to the primary
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        if has_request_context():
+            if self._flushing or getattr(clause, 'is_dml', False):
+                # the client's next reads have to see this write
+                g.wrote_primary = True
+            elif g.get('replica') is not None:
+                return g.replica
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+@contextmanager
+def use_primary():
+    # reads inside the block go to the primary even in a replica-routed request
+    replica = g.pop('replica', None) if has_request_context() else None
+    try:
+        yield
+    finally:
+        if replica is not None:
+            g.replica = replica
+
+
+class Replica:
+    __slots__ = ('engine', 'healthy', 'checked_at', 'lock')
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.healthy = True
+        self.checked_at = float('-inf')
+        self.lock = threading.Lock()
+
+
+class ReplicaSet:
+    # the replicas of one app, and whose turn is next
+    __slots__ = ('replicas', 'turn')
+
+    def __init__(self, replicas):
+        self.replicas = replicas
+        self.turn = itertools.count()
+
+
+class Replicas:
+    # round-robin over the healthy replicas of SQLALCHEMY_REPLICA_URIS. A
+    # replica is checked (reachable, and no more than REPLICA_MAX_LAG seconds
+    # behind) at most every REPLICA_HEALTH_INTERVAL seconds, by the first
+    # request picking it once the interval has passed; with no healthy
+    # replica, reads fall back to the primary.
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_HEALTH_INTERVAL', 5)
+        app.config.setdefault('REPLICA_MAX_LAG', 5)
+        app.config.setdefault('REPLICA_CONNECT_TIMEOUT', 2)
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 10)
+        app.extensions['fyyur_replicas'] = ReplicaSet(
+            [Replica(self._create_engine(app, uri)) for uri in app.config['SQLALCHEMY_REPLICA_URIS']])
+        app.after_request(self._stick_to_primary)
+
+    def _create_engine(self, app, uri):
+        options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}, pool_pre_ping=True)
+        if make_url(uri).get_backend_name() == 'postgresql':
+            options.setdefault('connect_args', {}).setdefault('connect_timeout', app.config['REPLICA_CONNECT_TIMEOUT'])
+        return create_engine(uri, **options)
+
+    @staticmethod
+    def _replicas(app=None):
+        return (app or current_app).extensions['fyyur_replicas'].replicas
+
+    def engines(self, app=None):
+        return [replica.engine for replica in self._replicas(app)]
+
+    def dispose(self, app=None):
+        for engine in self.engines(app):
+            engine.dispose()
+
+    def choose(self):
+        # the next healthy replica's engine, or None for the primary
+        replica_set = current_app.extensions['fyyur_replicas']
+        replicas = replica_set.replicas
+        for _ in range(len(replicas)):
+            replica = replicas[next(replica_set.turn) % len(replicas)]
+            if self._is_healthy(replica):
+                return replica.engine
+        return None
+
+    def _is_healthy(self, replica):
+        if time.monotonic() - replica.checked_at >= current_app.config['REPLICA_HEALTH_INTERVAL']:
+            # one request checks; the others go by the last result meanwhile
+            if replica.lock.acquire(blocking=False):
+                try:
+                    replica.healthy = self._check(replica)
+                    replica.checked_at = time.monotonic()
+                finally:
+                    replica.lock.release()
+        return replica.healthy
+
+    def _check(self, replica):
+        try:
+            with replica.engine.connect() as connection:
+                if connection.dialect.name != 'postgresql':
+                    connection.execute(text('SELECT 1'))
+                    return True
+                lag = connection.execute(REPLICA_LAG).scalar()
+        except DBAPIError as error:
+            current_app.logger.warning('replica %r is unreachable: %s', replica.engine.url, error.orig)
+            return False
+        if lag is not None and lag > current_app.config['REPLICA_MAX_LAG']:
+            current_app.logger.warning('replica %r is %.1fs behind', replica.engine.url, lag)
+            return False
+        return True
+
+    def reads(self, view):
+        # runs the view's reads on a replica, unless this client wrote a moment ago
+        @wraps(view)
+        def wrapper(**kwargs):
+            if self._replicas() and session.get(PRIMARY_UNTIL, 0) <= time.time():
+                g.replica = self.choose()
+            return view(**kwargs)
+        return wrapper
+
+    def _stick_to_primary(self, response):
+        # a client that just wrote reads from the primary until the replicas
+        # have caught up, so its redirect lands on a page showing the write
+        if self._replicas() and g.get('wrote_primary'):
+            session[PRIMARY_UNTIL] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+        return response
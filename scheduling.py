@@ -0,0 +1,142 @@
+from datetime import timedelta
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from models import db, Venue, Artist, Show, Booking
+from forms import ShowForm
+from importer import form_data
+from counters import refresh_counters
+from cache import show_tags
+
+#----------------------------------------------------------------------------#
+# Scheduling shows in batches, with double bookings rejected by the database.
+#----------------------------------------------------------------------------#
+
+OVERLAP_CONSTRAINTS = ('booking_venue_overlap', 'booking_artist_overlap')
+
+
+class ScheduleError(Exception):
+    # problems[i] describes what is wrong with the entry at index i
+    def __init__(self, problems):
+        super().__init__(problems)
+        self.problems = problems
+
+
+class InvalidEntries(ScheduleError):
+    pass
+
+
+class UnknownReferences(ScheduleError):
+    pass
+
+
+class Conflicts(ScheduleError):
+    pass
+
+
+def parse_entries(records):
+    # validates every entry with ShowForm, as the single-show form does; returns
+    # [{'artist_id', 'venue_id', 'start_time', 'duration_minutes'}, ...]
+    entries = []
+    problems = []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            problems.append({'index': index, 'error': 'not an object'})
+            continue
+        form = ShowForm(formdata=form_data(record), meta={'csrf': False})
+        if not form.validate():
+            problems.append({'index': index, 'error': '; '.join(
+                f'{field}: {", ".join(errors)}' for field, errors in form.errors.items())})
+            continue
+        entries.append(form.schedule_entry())
+    if problems:
+        raise InvalidEntries(problems)
+    return entries
+
+
+def unknown_references(entries):
+    # every venue and artist id of the batch checked in one round trip
+    venue_ids = {entry['venue_id'] for entry in entries if entry['venue_id'] is not None}
+    artist_ids = {entry['artist_id'] for entry in entries if entry['artist_id'] is not None}
+    found = set(db.session.execute(db.union_all(
+        db.select(db.literal('venue'), Venue.id).where(Venue.id.in_(venue_ids)),
+        db.select(db.literal('artist'), Artist.id).where(Artist.id.in_(artist_ids)),
+    )))
+    problems = []
+    for index, entry in enumerate(entries):
+        missing = [kind for kind in ('venue', 'artist') if (kind, entry[f'{kind}_id']) not in found]
+        if missing:
+            problems.append({'index': index, 'error': f'unknown {" and ".join(missing)}'})
+    return problems
+
+
+def _insert_shows(entries):
+    # returns the new show ids in entry order
+    rows = [{key: entry[key] for key in ('artist_id', 'venue_id', 'start_time')} for entry in entries]
+    if db.engine.dialect.name == 'postgresql':
+        # ids are drawn up front so the shows go out as one batched INSERT
+        ids = [show_id for show_id, in db.session.execute(
+            text("SELECT nextval('show_id_seq') FROM generate_series(1, :count)"), {'count': len(rows)})]
+        db.session.execute(Show.__table__.insert().execution_options(cache_tags=show_tags(rows)),
+            [dict(row, id=show_id) for row, show_id in zip(rows, ids)])
+        return ids
+    shows = [Show(**row) for row in rows]
+    db.session.add_all(shows)
+    db.session.flush()
+    return [show.id for show in shows]
+
+
+def _overlapping(show_ids):
+    # SQLite has no exclusion constraints: one set-based self-join finds the
+    # new bookings overlapping any other, whether already stored or in the batch
+    new, other = aliased(Booking), aliased(Booking)
+    return db.session.query(new.show_id, other.show_id, new.venue_id == other.venue_id) \
+        .join(other, db.and_(
+            other.show_id != new.show_id,
+            db.or_(other.venue_id == new.venue_id, other.artist_id == new.artist_id),
+            other.starts_at < new.ends_at,
+            new.starts_at < other.ends_at,
+        )) \
+        .filter(new.show_id.in_(show_ids)) \
+        .order_by(new.show_id, other.show_id).all()
+
+
+def schedule_shows(entries):
+    # inserts the shows and their bookings in the caller's transaction and
+    # returns the new show ids; raises a ScheduleError, leaving the rollback to
+    # the caller, when a reference is unknown or a booking overlaps another
+    problems = unknown_references(entries)
+    if problems:
+        raise UnknownReferences(problems)
+
+    show_ids = _insert_shows(entries)
+    bookings = [{
+        'show_id': show_id,
+        'venue_id': entry['venue_id'],
+        'artist_id': entry['artist_id'],
+        'starts_at': entry['start_time'],
+        'ends_at': entry['start_time'] + timedelta(minutes=entry['duration_minutes']),
+    } for show_id, entry in zip(show_ids, entries)]
+    try:
+        db.session.execute(Booking.__table__.insert(), bookings)
+    except IntegrityError as error:
+        constraint = getattr(getattr(error.orig, 'diag', None), 'constraint_name', None)
+        if constraint not in OVERLAP_CONSTRAINTS:
+            raise
+        # the first violation aborts the statement; its detail names both bookings
+        raise Conflicts([{'index': None, 'error': error.orig.diag.message_detail}])
+
+    if db.engine.dialect.name != 'postgresql':
+        index_of = {show_id: index for index, show_id in enumerate(show_ids)}
+        overlaps = _overlapping(show_ids)
+        if overlaps:
+            raise Conflicts([{
+                'index': index_of[show_id],
+                'error': f'{"venue" if same_venue else "artist"} already booked by '
+                    + (f'entry {index_of[other_id]}' if other_id in index_of else f'show {other_id}'),
+            } for show_id, other_id, same_venue in overlaps])
+
+    # one set-based recount for the venues/artists that got shows
+    refresh_counters('venue', Venue.id.in_({entry['venue_id'] for entry in entries}))
+    refresh_counters('artist', Artist.id.in_({entry['artist_id'] for entry in entries}))
+    return show_ids
@@ -0,0 +1,32 @@
+import json
+from datetime import date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#----------------------------------------------------------------------------#
+# JSON encoding for the API and exports (orjson when installed).
+#----------------------------------------------------------------------------#
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    def dumps(value):
+        return orjson.dumps(value, default=_default)
+else:
+    _encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=_default)
+
+    def dumps(value):
+        return _encoder.encode(value)
+
+
+def dumps_text(value):
+    # dumps() returns bytes under orjson; streamed bodies mix it with str chunks
+    encoded = dumps(value)
+    return encoded.decode() if isinstance(encoded, bytes) else encoded
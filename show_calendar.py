@@ -0,0 +1,132 @@
+from datetime import date, datetime, timedelta, timezone
+from itertools import groupby
+from urllib.parse import urlencode
+from flask import current_app
+from models import db, Venue, Artist, Genre, Show
+from formatting import resolve_timezone
+from cache import entity_tag, period_tag, table_tag
+
+#----------------------------------------------------------------------------#
+# Shows grouped by day over a date window.
+#----------------------------------------------------------------------------#
+
+CALENDAR_COLUMNS = [
+    Show.id,
+    Show.start_time,
+    Show.venue_id,
+    Venue.name.label('venue_name'),
+    Venue.city.label('city'),
+    Venue.state.label('state'),
+    Show.artist_id,
+    Artist.name.label('artist_name'),
+    Artist.image_link.label('artist_image_link'),
+]
+
+FILTERS = ['city', 'state', 'genre']
+
+
+def parse_window(args, max_days, today=None):
+    # (first day, last day) from ?from=&to= ISO dates, both included; a week from
+    # today (UTC) by default. Raises ValueError for bad or oversized windows.
+    first_day = date.fromisoformat(args['from']) if args.get('from') else (today or datetime.utcnow().date())
+    last_day = date.fromisoformat(args['to']) if args.get('to') else first_day + timedelta(days=6)
+    if last_day < first_day or (last_day - first_day).days >= max_days:
+        raise ValueError(f'window must cover 1 to {max_days} days')
+    return first_day, last_day
+
+
+def adjacent_windows(first_day, last_day):
+    # the windows of the same length just before and just after
+    span = last_day - first_day + timedelta(days=1)
+    return (first_day - span, last_day - span), (first_day + span, last_day + span)
+
+
+def parse_calendar_filters(args):
+    # city and state are the venue's, genre is the artist's
+    return {name: args[name].strip() for name in FILTERS if args.get(name, '').strip()}
+
+
+def window_bounds(first_day, last_day, tz_name):
+    # the naive UTC range covering the window's days in the display timezone
+    tz = resolve_timezone(tz_name)
+
+    def utc(day):
+        return tz.localize(datetime.combine(day, datetime.min.time())).astimezone(timezone.utc).replace(tzinfo=None)
+    return utc(first_day), utc(last_day + timedelta(days=1))
+
+
+def calendar_query(lower, upper, filters):
+    # one range scan of ix_show_start_time_id (pruned to the window's partitions
+    # on PostgreSQL), however much history the table holds
+    query = db.session.query(*CALENDAR_COLUMNS) \
+        .select_from(Show) \
+        .join(Venue, Venue.id == Show.venue_id) \
+        .join(Artist, Artist.id == Show.artist_id) \
+        .filter(Show.start_time >= lower, Show.start_time < upper)
+    if 'city' in filters:
+        query = query.filter(Venue.city == filters['city'])
+    if 'state' in filters:
+        query = query.filter(Venue.state == filters['state'])
+    if 'genre' in filters:
+        query = query.filter(Artist.genres.any(Genre.name == filters['genre']))
+    return query.order_by(Show.start_time, Show.id)
+
+
+def calendar_days(lower, upper, filters, tz_name):
+    # [{'date': day, 'shows': [...]}, ...] for the local days that have shows
+    tz = resolve_timezone(tz_name)
+
+    def local_day(row):
+        return row.start_time.replace(tzinfo=timezone.utc).astimezone(tz).date()
+    rows = calendar_query(lower, upper, filters).all()
+    return [
+        {'date': day, 'shows': [row._asdict() for row in day_rows]}
+        for day, day_rows in groupby(rows, key=local_day)
+    ]
+
+
+def calendar_tags(lower, upper, filters):
+    # the months of shows a window covers and the venues/artists it names;
+    # bulk statements without tags still drop every window
+    periods = []
+    month = lower.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while month < upper:
+        periods.append(period_tag(month))
+        month = (month + timedelta(days=32)).replace(day=1)
+    tags = [*periods, table_tag('show'), table_tag('venue'), table_tag('artist'), table_tag('genre')]
+    # a venue/artist written elsewhere can start or stop matching the filters
+    if 'city' in filters or 'state' in filters:
+        tags.append('venues')
+    if 'genre' in filters:
+        tags.append('artists')
+
+    def window_tags(days):
+        if days is None:
+            # any venue/artist until the shows are known
+            return tags + ['venues', 'artists']
+        shows = [show for day in days for show in day['shows']]
+        return tags + [*{entity_tag('venue', show['venue_id']) for show in shows},
+                       *{entity_tag('artist', show['artist_id']) for show in shows}]
+    return window_tags
+
+
+class ShowCalendar:
+    # calendar windows through the page cache, keyed on (window, filters,
+    # timezone); a show write drops the windows covering its month in every
+    # worker, a venue/artist write the windows naming it
+
+    def __init__(self, app=None, cache=None):
+        if app is not None:
+            self.init_app(app, cache)
+
+    def init_app(self, app, cache):
+        app.config.setdefault('CALENDAR_MAX_DAYS', 62)
+        app.extensions['fyyur_calendar'] = cache
+
+    def days(self, first_day, last_day, filters, tz_name='UTC'):
+        # days are cut in the display timezone, so it is part of the key
+        key = f'calendar:{first_day}:{last_day}:{urlencode(sorted(filters.items()))}:{tz_name}'
+        lower, upper = window_bounds(first_day, last_day, tz_name)
+        cache = current_app.extensions['fyyur_calendar']
+        return cache.cached(key, lambda: calendar_days(lower, upper, filters, tz_name),
+                            tags=calendar_tags(lower, upper, filters))
@@ -2,3 +2,29 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Typeahead suggestions for the venue/artist search boxes
+(function () {
+  var inputs = document.querySelectorAll('input[data-autocomplete]');
+  Array.prototype.forEach.call(inputs, function (input) {
+    var datalist = document.getElementById(input.getAttribute('list'));
+    var timer = null;
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        var url = '/api/autocomplete?kind=' + input.getAttribute('data-autocomplete') +
+          '&q=' + encodeURIComponent(input.value);
+        fetch(url).then(function (response) {
+          return response.json();
+        }).then(function (data) {
+          datalist.innerHTML = '';
+          data.results.forEach(function (result) {
+            var option = document.createElement('option');
+            option.value = result.name;
+            datalist.appendChild(option);
+          });
+        });
+      }, 100);
+    });
+  });
+})();
@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from models import db
+
+
+@pytest.fixture
+def app():
+    # an in-memory SQLite database per test, with the page cache off so every
+    # request runs its queries
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'CACHE_ENABLED': False,
+    })
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def queries(app):
+    # the statements sent to the app's database while the test runs
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+def load_dataset(app, shows):
+    # the seeded benchmark catalogue, replacing whatever the database holds;
+    # 20 shows per venue, 10 per artist
+    from benchmarks.dataset import load
+    return load(app, shows, reset=True)
+
+
+def copy_primary(app, path):
+    # a file copy of the app's in-memory database, for a second engine to read
+    with app.app_context():
+        connection = db.engine.raw_connection()
+        try:
+            target = sqlite3.connect(path)
+            connection.driver_connection.backup(target)
+            target.close()
+        finally:
+            connection.close()
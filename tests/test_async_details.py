@@ -0,0 +1,66 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+from flask import g
+
+from app import create_app, async_details, replicas
+from loaders import load_venue, load_artist
+from tests.conftest import copy_primary, load_dataset
+
+
+@pytest.fixture
+def async_app(tmp_path):
+    path = tmp_path / 'async.db'
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'ASYNC_DATABASE_URI': f'sqlite+aiosqlite:///{path}',
+        # aiosqlite connections are not pooled
+        'ASYNC_POOL_SIZE': None,
+        'TESTING': True,
+        'CACHE_ENABLED': False,
+    })
+    load_dataset(app, 500)
+    copy_primary(app, str(path))
+    return app
+
+
+def test_async_loads_match_the_blocking_loaders(async_app):
+    now = datetime.utcnow()
+    with async_app.test_request_context():
+        for entity_id in (1, 2, 999999):
+            assert async_details.load('venue', entity_id, now) == load_venue(entity_id, now)
+            assert async_details.load('artist', entity_id, now) == load_artist(entity_id, now)
+
+
+def test_async_queries_are_counted_in_the_request(async_app):
+    client = async_app.test_client()
+    response = client.get('/venues/1')
+    response.get_data()
+    response.close()
+    # the validator lookup, then the four detail queries from the event loop
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert 'fyyur_request_queries_bucket{endpoint="main.show_venue",le="3"} 0' in metrics
+    assert 'fyyur_request_queries_bucket{endpoint="main.show_venue",le="5"} 1' in metrics
+
+
+def test_replica_routed_loads_read_the_replica(tmp_path):
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SQLALCHEMY_REPLICA_URIS': [f'sqlite:///{replica}'],
+        'ASYNC_DATABASE_URI': f'sqlite+aiosqlite:///{primary}',
+        'ASYNC_POOL_SIZE': None,
+        'TESTING': True,
+        'CACHE_ENABLED': False,
+    })
+    load_dataset(app, 200)
+    copy_primary(app, str(primary))
+    copy_primary(app, str(replica))
+    with sqlite3.connect(replica) as connection:
+        connection.execute("UPDATE venue SET name = 'Only On The Replica' WHERE id = 1")
+
+    with app.test_request_context():
+        assert async_details.load('venue', 1)['name'] != 'Only On The Replica'
+        g.replica = replicas.engines()[0]
+        assert async_details.load('venue', 1)['name'] == 'Only On The Replica'
@@ -0,0 +1,51 @@
+import random
+from datetime import datetime, timedelta
+
+from app import autocomplete
+from autocomplete import PrefixIndex, SORT_THRESHOLD
+from deletion import delete_entities
+from models import db, Venue
+
+
+def names(results):
+    return [result['name'] for result in results]
+
+
+def test_build_sorts_once_and_matches_added_entries():
+    rows = [(entity_id, f'Hall {entity_id:05d}') for entity_id in range(5000)]
+    random.Random(1).shuffle(rows)
+    built = PrefixIndex.build(1 << 30, rows)
+    added = PrefixIndex(1 << 30)
+    for entity_id, name in rows:
+        added.add(entity_id, name)
+    assert built._keys == added._keys
+    assert names(built.lookup('hall 0001', 3)) == ['Hall 00010', 'Hall 00011', 'Hall 00012']
+
+
+def test_update_applies_small_and_large_batches():
+    for count in (10, SORT_THRESHOLD + 1):
+        index = PrefixIndex.build(1 << 30, [(entity_id, f'Old {entity_id}') for entity_id in range(count)])
+        index.update([(entity_id, f'New {entity_id}') for entity_id in range(1, count)], removed={0})
+        assert len(index) == count - 1
+        assert index.lookup('old') == [] and names(index.lookup('new 1', 1)) == ['New 1']
+        assert index._keys == sorted(index._keys)
+
+
+def test_refresh_applies_other_workers_writes(app):
+    with app.app_context():
+        db.session.add_all([Venue(name='The Musical Hop'), Venue(name='Park Square Live Music & Coffee')])
+        db.session.commit()
+        autocomplete.rebuild()
+        since = datetime.utcnow() - timedelta(seconds=1)
+
+        # written without going through this worker's index
+        Venue.query.get(1).name = 'The Dueling Pianos Bar'
+        db.session.add(Venue(name='The Musical Hop Annex'))
+        db.session.commit()
+        delete_entities('venue', [2])
+
+        autocomplete.refresh(since)
+        # the index itself: lookup() would start this worker's watcher thread
+        index = app.extensions['fyyur_autocomplete'].indexes['venue']
+        assert names(index.lookup('the')) == ['The Dueling Pianos Bar', 'The Musical Hop Annex']
+        assert index.lookup('park') == []
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from models import db, Show, Booking
+from importer import import_records
+from scheduling import _overlapping
+from tests.conftest import load_dataset
+
+
+def unbooked_shows():
+    return db.session.query(Show.id).outerjoin(Booking, Booking.show_id == Show.id) \
+        .filter(Booking.show_id.is_(None)).count()
+
+
+def test_generated_shows_are_booked_without_overlaps(app):
+    load_dataset(app, 4000)
+    with app.app_context():
+        assert db.session.query(Booking.show_id).count() == 4000
+        assert unbooked_shows() == 0
+        show_ids = [show_id for show_id, in db.session.query(Show.id)]
+        assert _overlapping(show_ids) == []
+
+
+def test_imported_shows_are_booked(app):
+    load_dataset(app, 200)
+    records = [
+        (1, {'venue_id': 1, 'artist_id': 1, 'start_time': '2031-05-01T20:00:00'}),
+        (2, {'venue_id': 2, 'artist_id': 2, 'start_time': '2031-05-01T20:00:00', 'duration_minutes': 90}),
+        # the same venue an hour into the first show
+        (3, {'venue_id': 1, 'artist_id': 3, 'start_time': '2031-05-01T21:00:00'}),
+    ]
+    rejects = []
+    with app.app_context():
+        imported, rejected = import_records('shows', records, on_reject=lambda *reject: rejects.append(reject))
+        assert (imported, rejected) == (2, 1)
+        assert [line_number for line_number, _, _ in rejects] == [3]
+        assert unbooked_shows() == 0
+        assert sorted((booking.venue_id, (booking.ends_at - booking.starts_at).seconds // 60)
+                      for booking in Booking.query.filter(Booking.starts_at >= datetime(2031, 1, 1))) == [(1, 120), (2, 90)]
@@ -0,0 +1,142 @@
+import pytest
+
+from app import cache
+from cache import RedisTier, area_tag, entity_tag, invalidate_on_commit
+from models import db, Venue, CacheVersion
+
+
+@pytest.fixture
+def cached_app(app):
+    # the cache on, with versions re-read on every lookup unless a test says otherwise
+    app.config.update(CACHE_ENABLED=True, CACHE_VERSION_TTL=0)
+    with app.app_context():
+        db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street'))
+        db.session.commit()
+    return app
+
+
+class Producer:
+    # counts the misses it fills
+    def __init__(self, value='page'):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def test_commit_invalidates_tagged_entries(cached_app):
+    venue_page, other_page = Producer(), Producer()
+    with cached_app.test_request_context():
+        for _ in range(2):
+            cache.cached('venue:1', venue_page, tags=[entity_tag('venue', 1)])
+            cache.cached('venue:2', other_page, tags=[entity_tag('venue', 2)])
+        assert (venue_page.calls, other_page.calls) == (1, 1)
+
+        Venue.query.get(1).name = 'The Renamed Hop'
+        db.session.commit()
+        cache.cached('venue:1', venue_page, tags=[entity_tag('venue', 1)])
+        cache.cached('venue:2', other_page, tags=[entity_tag('venue', 2)])
+    assert (venue_page.calls, other_page.calls) == (2, 1)
+
+
+def test_moved_venue_invalidates_both_areas(cached_app):
+    old_area, new_area = Producer(), Producer()
+
+    def read():
+        cache.cached('old', old_area, tags=[area_tag('CA', 'San Francisco')])
+        cache.cached('new', new_area, tags=[area_tag('NY', 'New York')])
+
+    with cached_app.test_request_context():
+        read()
+        venue = Venue.query.get(1)
+        venue.city, venue.state = 'New York', 'NY'
+        db.session.commit()
+        read()
+    assert (old_area.calls, new_area.calls) == (2, 2)
+
+
+def test_rollback_drops_pending_tags(cached_app):
+    page = Producer()
+    with cached_app.test_request_context():
+        cache.cached('venue:1', page, tags=[entity_tag('venue', 1)])
+        Venue.query.get(1).name = 'Never Committed'
+        db.session.flush()
+        db.session.rollback()
+        # a later commit does not bump what the rolled back transaction touched
+        db.session.add(Venue(name='Another Hall', city='Austin', state='TX', address='1 Main Street'))
+        db.session.commit()
+        cache.cached('venue:1', page, tags=[entity_tag('venue', 1)])
+    assert page.calls == 1
+
+
+def test_commit_racing_a_fill_is_not_stored(cached_app):
+    def rename_while_reading():
+        value = Venue.query.get(1).name
+        Venue.query.get(1).name = 'Renamed Meanwhile'
+        db.session.commit()
+        return value
+
+    with cached_app.test_request_context():
+        assert cache.cached('venue:1', rename_while_reading, tags=[entity_tag('venue', 1)]) == 'The Musical Hop'
+        assert cache.cached('venue:1', lambda: Venue.query.get(1).name, tags=[entity_tag('venue', 1)]) \
+            == 'Renamed Meanwhile'
+
+
+def test_value_tags_are_raced_by_their_stand_ins(cached_app):
+    # a detail page's tags name the other side's entities once they are known;
+    # before that, a write to any of them has to spoil the fill
+    def tags(value):
+        return [entity_tag('venue', 1)] + (['artists'] if value is None else [entity_tag('artist', 7)])
+
+    def read_then_artist_write():
+        invalidate_on_commit(db.session, ['artists', entity_tag('artist', 7)])
+        db.session.commit()
+        return 'stale'
+
+    with cached_app.test_request_context():
+        assert cache.cached('venue:1', read_then_artist_write, tags=tags) == 'stale'
+        assert cache.cached('venue:1', lambda: 'fresh', tags=tags) == 'fresh'
+
+
+def test_snapshot_serves_hits_without_queries(cached_app, queries):
+    cached_app.config['CACHE_VERSION_TTL'] = 60
+    with cached_app.test_request_context():
+        cache.clear()
+        cache.cached('venue:1', Producer(), tags=[entity_tag('venue', 1)])
+        cache.cached('venue:1', Producer(), tags=[entity_tag('venue', 1)])
+        queries.clear()
+        cache.cached('venue:1', Producer(), tags=[entity_tag('venue', 1)])
+        assert queries == []
+
+        # this worker's own commit is seen at once
+        Venue.query.get(1).name = 'The Renamed Hop'
+        db.session.commit()
+        page = Producer()
+        cache.cached('venue:1', page, tags=[entity_tag('venue', 1)])
+        # writers only lock the rows of their own tags
+        assert CacheVersion.query.get('*') is None
+    assert page.calls == 1
+
+
+def test_redis_tier_is_shared_between_workers(cached_app):
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    tiers = cached_app.extensions['fyyur_cache']
+    tiers.shared = RedisTier(fakeredis.FakeRedis(server=server), 'fyyur:')
+
+    page = Producer()
+    with cached_app.test_request_context():
+        cache.cached('venue:1', page, tags=[entity_tag('venue', 1)])
+        # another worker: an empty local tier over the same Redis
+        cache.clear()
+        cache.cached('venue:1', page, tags=[entity_tag('venue', 1)])
+        assert page.calls == 1
+        assert fakeredis.FakeRedis(server=server).exists('fyyur:value:venue:1')
+
+        Venue.query.get(1).name = 'The Renamed Hop'
+        db.session.commit()
+        cache.clear()
+        cache.cached('venue:1', page, tags=[entity_tag('venue', 1)])
+    assert page.calls == 2
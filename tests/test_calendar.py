@@ -0,0 +1,48 @@
+from datetime import date, datetime
+
+from app import show_calendar
+from models import db, Venue, Artist
+from scheduling import schedule_shows
+
+
+def test_show_writes_drop_only_the_windows_of_their_month(app, queries):
+    app.config.update(CACHE_ENABLED=True, CACHE_VERSION_TTL=0)
+    windows = {'august': (date(2030, 8, 1), date(2030, 8, 7)), 'october': (date(2030, 10, 1), date(2030, 10, 7))}
+    with app.test_request_context():
+        db.session.add_all([Venue(name='The Musical Hop'), Artist(name='Guns N Petals'),
+                            Venue(name='Park Square Live Music & Coffee'), Artist(name='Matt Quevedo')])
+        db.session.commit()
+        schedule_shows([{'venue_id': 1, 'artist_id': 1, 'duration_minutes': 60,
+                         'start_time': datetime(2030, 8, 2, 20)}])
+        db.session.commit()
+        for first_day, last_day in windows.values():
+            show_calendar.days(first_day, last_day, {})
+
+        # by a venue and artist the August window does not name
+        schedule_shows([{'venue_id': 2, 'artist_id': 2, 'duration_minutes': 60,
+                         'start_time': datetime(2030, 10, 3, 20)}])
+        db.session.commit()
+        queries.clear()
+        august = show_calendar.days(*windows['august'], {})
+        assert not any('FROM show' in statement for statement in queries)
+        october = show_calendar.days(*windows['october'], {})
+        assert any('FROM show' in statement for statement in queries)
+    assert [day['date'] for day in august] == [date(2030, 8, 2)]
+    assert [day['date'] for day in october] == [date(2030, 10, 3)]
+
+
+def test_renaming_a_venue_drops_the_windows_naming_it(app):
+    app.config.update(CACHE_ENABLED=True, CACHE_VERSION_TTL=0)
+    window = (date(2030, 8, 1), date(2030, 8, 7))
+    with app.test_request_context():
+        db.session.add_all([Venue(name='The Musical Hop'), Artist(name='Guns N Petals')])
+        db.session.commit()
+        schedule_shows([{'venue_id': 1, 'artist_id': 1, 'duration_minutes': 60,
+                         'start_time': datetime(2030, 8, 2, 20)}])
+        db.session.commit()
+        show_calendar.days(*window, {})
+
+        Venue.query.get(1).name = 'The Dueling Pianos Bar'
+        db.session.commit()
+        days = show_calendar.days(*window, {})
+    assert days[0]['shows'][0]['venue_name'] == 'The Dueling Pianos Bar'
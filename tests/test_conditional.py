@@ -0,0 +1,81 @@
+import time
+from datetime import datetime, timedelta
+
+from genres import rename_genre, set_genres
+from models import db, Venue, Artist
+from scheduling import schedule_shows
+from tests.conftest import load_dataset
+
+
+def revalidate(client, url, etag):
+    return client.get(url, headers={'If-None-Match': etag})
+
+
+def test_unchanged_pages_answer_304(app, client):
+    load_dataset(app, 200)
+    for url in ['/venues', '/artists', '/shows', '/venues/1', '/artists/1']:
+        response = client.get(url)
+        response.get_data()
+        assert response.status_code == 200 and response.headers['ETag']
+        assert revalidate(client, url, response.headers['ETag']).status_code == 304
+
+
+def test_validators_read_cache_versions_not_tables(app, client, queries):
+    load_dataset(app, 200)
+    etag = client.get('/venues').headers['ETag']
+    queries.clear()
+    assert revalidate(client, '/venues', etag).status_code == 304
+    assert len(queries) == 1
+    assert 'cache_version' in queries[0] and 'count(' not in queries[0].lower()
+
+
+def test_writes_change_the_validators(app, client):
+    load_dataset(app, 200)
+    etags = {url: client.get(url).headers['ETag'] for url in ['/venues', '/venues/1', '/venues/2', '/artists/1']}
+
+    with app.app_context():
+        Venue.query.get(1).name = 'The Renamed Hall'
+        db.session.commit()
+    assert revalidate(client, '/venues', etags['/venues']).status_code == 200
+    assert revalidate(client, '/venues/1', etags['/venues/1']).status_code == 200
+    # the artist pages list the names of the venues of their shows
+    assert revalidate(client, '/artists/1', etags['/artists/1']).status_code == 200
+
+    etag = client.get('/venues/2').headers['ETag']
+    with app.app_context():
+        schedule_shows([{'venue_id': 2, 'artist_id': 1, 'duration_minutes': 60,
+                         'start_time': datetime.utcnow() + timedelta(days=400)}])
+        db.session.commit()
+    assert revalidate(client, '/venues/2', etag).status_code == 200
+
+
+def test_genre_changes_change_the_validators(app, client):
+    load_dataset(app, 200)
+    etag = client.get('/venues/1').headers['ETag']
+    with app.app_context():
+        venue = Venue.query.get(1)
+        set_genres(venue, [genre.name for genre in venue.genres][1:] or ['Folk'])
+        db.session.commit()
+    etag, previous = client.get('/venues/1').headers['ETag'], etag
+    assert etag != previous
+
+    with app.app_context():
+        genre = Venue.query.get(1).genres[0].name
+        assert rename_genre(genre, f'{genre} Revival')
+        db.session.commit()
+    assert revalidate(client, '/venues/1', etag).status_code == 200
+
+
+def test_last_modified_moves_when_a_show_starts(app, client):
+    with app.app_context():
+        db.session.add_all([Venue(name='The Musical Hop'), Artist(name='Guns N Petals')])
+        db.session.commit()
+        schedule_shows([{'venue_id': 1, 'artist_id': 1, 'duration_minutes': 60,
+                         'start_time': datetime.utcnow() + timedelta(seconds=1.5)}])
+        db.session.commit()
+    last_modified = client.get('/venues/1').headers['Last-Modified']
+    assert client.get('/venues/1', headers={'If-Modified-Since': last_modified}).status_code == 304
+    # the show moved from upcoming to past without any write
+    time.sleep(2)
+    response = client.get('/venues/1', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 200 and response.headers['Last-Modified'] != last_modified
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+from sqlalchemy import text
+
+from app import create_app
+from models import db
+from query_plans import PLAN_INDEX, check_indexes
+from tests.conftest import load_dataset
+
+# a scratch PostgreSQL database whose tables the tests drop and recreate
+DATABASE_URL = os.environ.get('FYYUR_TEST_DATABASE_URL')
+
+requires_postgresql = pytest.mark.skipif(
+    not DATABASE_URL, reason='set FYYUR_TEST_DATABASE_URL to a scratch PostgreSQL database')
+
+# declared by the migrations on the parent tables
+PERFORMANCE_INDEXES = [
+    'ix_show_venue_id_start_time', 'ix_show_artist_id_start_time', 'ix_show_start_time_id',
+    'ix_venue_state_city', 'ix_venue_name_trgm', 'ix_artist_name_trgm',
+]
+
+
+@pytest.fixture(scope='module')
+def postgresql_app():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': DATABASE_URL, 'TESTING': True, 'CACHE_ENABLED': False})
+    # on PostgreSQL the schema comes from the migrations, partitions and all
+    load_dataset(app, 2000)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_plan_index_names():
+    plan = '\n'.join([
+        'Limit  (cost=0.29..8.31 rows=1 width=4)',
+        '  ->  Append',
+        '        ->  Index Scan using show_y2022m08_venue_id_start_time_idx on show_y2022m08 show_1',
+        '        ->  Index Only Scan Backward using ix_venue_state_city on venue',
+        '              ->  Bitmap Index Scan on ix_venue_name_trgm',
+        '        ->  Seq Scan on genre',
+    ])
+    assert PLAN_INDEX.findall(plan) == [
+        'show_y2022m08_venue_id_start_time_idx', 'ix_venue_state_city', 'ix_venue_name_trgm']
+
+
+@requires_postgresql
+def test_migrations_create_the_performance_indexes(postgresql_app):
+    with postgresql_app.app_context():
+        names = {name for name, in db.session.execute(
+            text('SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()'))}
+    assert set(PERFORMANCE_INDEXES) - names == set()
+
+
+@requires_postgresql
+def test_planner_uses_the_indexes(postgresql_app):
+    with postgresql_app.app_context(), db.engine.connect() as connection:
+        results = check_indexes(connection)
+    # every partition's index resolves to the one declared on the parent
+    assert [(description, plan) for description, _, used, plan in results if not used] == []
@@ -0,0 +1,21 @@
+from app import create_app
+
+
+def test_server_timing_only_on_bodies_sent_whole(client):
+    # /venues streams its body, the search results page does not
+    streamed = client.get('/venues')
+    streamed.get_data()
+    assert 'Server-Timing' not in streamed.headers
+    assert 'db;dur=' in client.post('/venues/search', data={'search_term': 'hall'}).headers['Server-Timing']
+
+
+def test_metrics_are_kept_per_app(app, client):
+    client.get('/venues').close()
+    other = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+    assert 'endpoint="main.venues"' not in other.test_client().get('/metrics').get_data(as_text=True)
+    assert 'endpoint="main.venues"' in client.get('/metrics').get_data(as_text=True)
+
+
+def test_metrics_answer_the_allowed_networks_only(client):
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.9'}).status_code == 404
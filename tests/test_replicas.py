@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import event
+
+from app import create_app, replicas
+from models import db
+from replicas import PRIMARY_UNTIL
+from tests.conftest import copy_primary, load_dataset
+
+
+def make_app(replica_uris):
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SQLALCHEMY_REPLICA_URIS': replica_uris,
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'CACHE_ENABLED': False,
+    })
+
+
+class Databases:
+    # names the database ('primary', or a replica's file name) of each statement
+
+    def __init__(self, app):
+        self.seen = []
+        with app.app_context():
+            engines = [db.engine] + replicas.engines(app)
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._record)
+
+    def _record(self, connection, cursor, statement, parameters, context, executemany):
+        database = connection.engine.url.database
+        self.seen.append(database.rsplit('/', 1)[-1] if database else 'primary')
+
+    def of(self, request):
+        self.seen.clear()
+        response = request()
+        response.get_data()
+        return set(self.seen)
+
+
+@pytest.fixture
+def replica_files(tmp_path):
+    return [str(tmp_path / 'replica1.db'), str(tmp_path / 'replica2.db')]
+
+
+@pytest.fixture
+def routed(replica_files):
+    app = make_app([f'sqlite:///{path}' for path in replica_files])
+    load_dataset(app, 200)
+    for path in replica_files:
+        copy_primary(app, path)
+    return app, app.test_client(), Databases(app)
+
+
+def test_read_views_take_turns_on_the_replicas(routed):
+    app, client, databases = routed
+    # conditional pages read their validators on the primary, the page on the replica
+    assert databases.of(lambda: client.get('/venues/1')) == {'primary', 'replica1.db'}
+    assert databases.of(lambda: client.get('/artists')) == {'primary', 'replica2.db'}
+    assert databases.of(lambda: client.post('/venues/search', data={'search_term': 'hall'})) == {'replica1.db'}
+
+
+def test_other_views_read_from_the_primary(routed):
+    app, client, databases = routed
+    assert databases.of(lambda: client.get('/venues/create')) <= {'primary'}
+    assert databases.of(lambda: client.get('/shows/calendar')) == {'primary'}
+
+
+def test_a_client_that_wrote_reads_from_the_primary(routed):
+    app, client, databases = routed
+    response = client.post('/artists/1/edit', data={
+        'name': 'The Renamed Band', 'city': 'San Francisco', 'state': 'CA', 'phone': '', 'genres': ['Jazz'],
+        'facebook_link': 'https://www.facebook.com/renamed', 'image_link': 'https://images.example.com/renamed.jpg',
+        'website_link': 'https://renamed.example.com', 'seeking_description': '',
+    })
+    assert response.status_code == 302
+
+    # the replicas have not seen the rename, so the redirect must not go there
+    assert databases.of(lambda: client.get('/artists/1')) == {'primary'}
+    assert 'The Renamed Band' in client.get('/artists/1').get_data(as_text=True)
+
+    with client.session_transaction() as session:
+        session[PRIMARY_UNTIL] = 0
+    assert databases.of(lambda: client.get('/artists/1')) == {'primary', 'replica1.db'}
+
+
+def test_unreachable_replicas_are_skipped(tmp_path):
+    healthy = str(tmp_path / 'replica1.db')
+    app = make_app([f'sqlite:///{tmp_path}/missing/replica.db', f'sqlite:///{healthy}'])
+    load_dataset(app, 200)
+    copy_primary(app, healthy)
+    client = app.test_client()
+    databases = Databases(app)
+    assert databases.of(lambda: client.get('/venues/1')) == {'primary', 'replica1.db'}
+    assert databases.of(lambda: client.get('/venues/2')) == {'primary', 'replica1.db'}
+
+
+def test_reads_fall_back_to_the_primary_without_a_healthy_replica(tmp_path):
+    app = make_app([f'sqlite:///{tmp_path}/missing/replica.db'])
+    load_dataset(app, 200)
+    client = app.test_client()
+    databases = Databases(app)
+    assert databases.of(lambda: client.get('/venues/1')) == {'primary'}
@@ -0,0 +1,20 @@
+from models import db, Venue
+from loaders import search
+
+
+def test_city_state_search_matches_literally(app):
+    with app.app_context():
+        db.session.add_all([
+            Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street'),
+            Venue(name='The Dueling Pianos Bar', city='SanXFrancisco', state='CA', address='335 Delancey Street'),
+        ])
+        db.session.commit()
+
+        def names(term):
+            return [name for _, name in search(Venue, term)]
+
+        assert names('san francisco, ca') == ['The Musical Hop']
+        # "_" and "%" are not wildcards in the city and state either
+        assert names('San_Francisco, CA') == []
+        assert names('San Francisco, %') == []
+        assert names('hop') == ['The Musical Hop']
@@ -0,0 +1,47 @@
+import re
+from datetime import datetime, timedelta
+
+from loaders import iter_areas
+from models import db, Venue, Artist
+from scheduling import schedule_shows
+from tests.conftest import load_dataset
+
+
+def venues_page(client, queries):
+    # (venue links on the page, statements issued for it)
+    queries.clear()
+    response = client.get('/venues')
+    body = response.get_data(as_text=True)
+    assert response.status_code == 200
+    return len(re.findall(r'href="/venues/\d+"', body)), len(queries)
+
+
+def test_venues_page_queries_do_not_grow_with_venues(app, client, queries):
+    load_dataset(app, 200)
+    few_venues, few_queries = venues_page(client, queries)
+    load_dataset(app, 4000)
+    many_venues, many_queries = venues_page(client, queries)
+
+    assert (few_venues, many_venues) == (10, 200)
+    assert many_queries == few_queries
+
+
+def test_venues_page_counts_each_venues_own_upcoming_shows(app):
+    with app.app_context():
+        artist = Artist(name='The Wild Sax Band', city='San Francisco', state='CA')
+        busy = Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street')
+        quiet = Venue(name='Park Square Live Music & Coffee', city='San Francisco', state='CA', address='34 Whiskey Moore Ave')
+        db.session.add_all([artist, busy, quiet])
+        db.session.flush()
+        now = datetime.utcnow()
+        schedule_shows([
+            {'venue_id': busy.id, 'artist_id': artist.id, 'start_time': now + timedelta(days=1), 'duration_minutes': 120},
+            {'venue_id': busy.id, 'artist_id': artist.id, 'start_time': now + timedelta(days=2), 'duration_minutes': 120},
+            {'venue_id': quiet.id, 'artist_id': artist.id, 'start_time': now - timedelta(days=3), 'duration_minutes': 120},
+        ])
+        db.session.commit()
+
+        assert list(iter_areas()) == [{'city': 'San Francisco', 'state': 'CA', 'venues': [
+            {'id': quiet.id, 'name': 'Park Square Live Music & Coffee', 'num_upcoming_shows': 0},
+            {'id': busy.id, 'name': 'The Musical Hop', 'num_upcoming_shows': 2},
+        ]}]